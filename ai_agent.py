@@ -23,7 +23,8 @@ Quick Start / How to Use:
     *   Set `GEMINI_API_KEY` environment variable for Google Gemini.
 
 2.  **Install Dependencies:**
-    *   `pip install google-generativeai web3 websockets requests python-dotenv solders solana spl-token aiohttp`
+    *   `pip install google-generativeai web3 websockets requests python-dotenv solders solana spl-token aiohttp orjson`
+    *   Optional (Linux/macOS): `pip install uvloop` for a faster event loop; it is used automatically when installed.
     *   (Consider a `requirements.txt` file).
 
 3.  **Verify Utilities (Recommended):**
@@ -51,6 +52,7 @@ IMPORTANT SECURITY AND OPERATIONAL NOTES:
 5.  NO LIABILITY: Software provided "as-is". Authors/contributors are not liable for losses.
     USE AT YOUR OWN RISK.
 --------------------------------------------------------------------------------
+"""
 
 # /*-----------------------------------------------------------------------    # | Multi-Chain Capabilities & Token Analysis Features                    |
 # |-----------------------------------------------------------------------|
@@ -111,19 +113,31 @@ IMPORTANT SECURITY AND OPERATIONAL NOTES:
 # |   verifying AI agent integration with these analysis features.        |
 # \-----------------------------------------------------------------------*/
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import json
+import logging
+import orjson
+import re
+import string
+import hashlib
+import functools
+from html import escape as html_escape
+import itertools
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 import random
 import time
-import http.server
-import socketserver
 import threading
 import websockets
 import asyncio
-import requests
 import os
+import sys
+import signal
 import aiohttp
-from typing import List, Dict, Optional, Any
+from aiohttp import web
+from typing import List, Dict, Optional, Any, Callable, Awaitable
 
 from evm_utils import (
     connect_to_network as evm_connect_to_network,
@@ -131,6 +145,10 @@ from evm_utils import (
     execute_trade as evm_execute_trade,
     get_token_balance as evm_get_token_balance,
     approve_token as evm_approve_token,
+    get_erc20_snapshot as evm_get_erc20_snapshot,
+    get_trade_receipts as evm_get_trade_receipts,
+    close_rpc_sessions as evm_close_rpc_sessions,
+    NonceTracker as EvmNonceTracker,
     load_config
 )
 from solana_utils import (
@@ -150,6 +168,146 @@ from token_analyzer import (
 
 websocket_server_running = False
 http_server_running = False
+log = logging.getLogger("ai_agent")
+
+def _dumps(obj: Any, indent: bool = False) -> str:
+    """orjson-backed `json.dumps` (unknown types via str). Falls back to stdlib json for values orjson rejects, e.g. >64-bit ints."""
+    try: return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)).decode()
+    except TypeError: return json.dumps(obj, default=str, indent=2 if indent else None) # orjson.JSONEncodeError is a TypeError
+
+# Gemini errors worth retrying with backoff: rate limiting (429) and transient server-side failures.
+_TRANSIENT_GEMINI_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable,
+                            google_exceptions.InternalServerError, google_exceptions.DeadlineExceeded)
+
+_VERDICT_RE = re.compile(r'^\s*(APPROVE|REJECT)', re.I) # Leading verdict of a vote response
+_COMMAND_RE = re.compile(r'(TRADE|ANALYZE_TOKEN):\s*(.+)') # Agent commands, one per line
+_TRADE_RE = re.compile(r'^\s*(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s*$') # <IN> <OUT> <AMOUNT> <NETWORK> <PLATFORM>
+_LEGACY_TRADE_RE = re.compile(r'^\s*(BUY|SELL)\s+(\S+)\s+(\S+)\s*$', re.I) # Simulated: <BUY|SELL> <AMOUNT> <CRYPTO>
+# PairReport fields kept after a DexScreener fetch; token addresses, chain id and URL are never read back.
+_PAIR_FIELDS = ("pair_address", "dex_id", "price_usd", "liquidity_usd", "volume_h24", "pair_created_at")
+
+_EVM_ADDRESS_RE = re.compile(r'^0x[0-9a-f]{40}$')
+_UNPERSISTED_CONTEXT_KEYS = frozenset(("token_analysis_reports", "prices")) # Reports are rebuilt on demand; live prices would be stale after a restart
+
+def _token_key(address: str, chain_name: str) -> str:
+    """Canonical form for address comparisons: EVM addresses are lowercased, Solana mints are case-sensitive and kept as-is."""
+    return address if chain_name == "solana" else address.lower()
+
+def _freeze_safe_tokens(raw: Dict[str, List[str]]) -> Dict[str, frozenset]:
+    """Normalizes a chain -> addresses safe-list into frozensets via `_token_key`. Raises ValueError on a malformed EVM address."""
+    frozen = {}
+    for chain, addrs in raw.items():
+        keys = frozenset(_token_key(a, chain) for a in addrs)
+        bad = [a for a in keys if chain != "solana" and not _EVM_ADDRESS_RE.match(a)]
+        if bad: raise ValueError(f"Malformed address in SAFE_OUTPUT_TOKENS_BY_CHAIN[{chain!r}]: {bad}")
+        frozen[chain] = keys
+    return frozen
+
+# Discussion topic templates; `{token}` is filled from _TOPIC_TOKENS per call.
+_TOPIC_TOKENS = ("WBTC", "ETH", "MATIC", "SOL", "LINK", "UNI")
+_TOPICS_BASE = (
+    "Current market sentiment and short-term outlook for {token}",
+    "Is {token} a sound addition to the portfolio right now? Check its token analysis first.",
+    "Portfolio rebalancing: should we reduce BTC exposure in favour of {token}?",
+    "Risk review of recently analyzed tokens and any pending transactions",
+    "On-chain liquidity and DEX routing considerations for trading {token}",
+    "Lessons from today's executed and rejected transactions",
+)
+
+# Live log page served over HTTP; `$ws_port` is the WebSocket port the page connects back to (`$$` escapes JS template literals).
+_HTML_TEMPLATE = string.Template("<!DOCTYPE html><html lang=en><head><meta charset=UTF-8><meta name=viewport content=\"width=device-width,initial-scale=1\"><title>AI Crypto Agents Log</title><style>body{font-family:monospace;line-height:1.6;padding:20px;max-width:900px;margin:0 auto;background-color:#0a0a0a;color:#0f0}h1,h2{color:#0f0;border-bottom:1px solid #0c0;padding-bottom:5px}#log,#terminal{border:1px solid #0c0;padding:15px;margin-bottom:20px;border-radius:8px;height:400px;overflow-y:auto;background-color:#001a00;font-size:.9em}#synopsis{border:1px solid #0c0;padding:15px;margin-top:20px;background-color:#001a00;border-radius:8px}.interaction{margin-bottom:15px;padding-bottom:10px;border-bottom:1px dotted #030}.timestamp{color:#090;font-size:.8em}.agent{font-weight:700;color:#3c3}.topic{font-style:italic;color:#0a0;margin:5px 0}#status{color:#f33;font-weight:700;text-align:center;padding:10px;background-color:#1a0000;border-radius:5px;margin-bottom:10px}pre{white-space:pre-wrap;word-wrap:break-word;color:#cfc}</style></head><body><h1>AI Crypto Agents Log</h1><div id=status>Connecting...</div><h2>System Terminal</h2><div id=terminal><p>Terminal init...</p></div><h2>Agent Discussion</h2><div id=log><p>Log init...</p></div><h2>Daily Synopsis</h2><div id=synopsis><p>Synopsis init...</p></div><script>const term=document.getElementById('terminal'),logDiv=document.getElementById('log'),synDiv=document.getElementById('synopsis'),statDiv=document.getElementById('status');let sock;function fmt(t){if('string'!=typeof t)t=String(t);return t.replace(/</g,'&lt;').replace(/>/g,'&gt;').replace(/\\n/g,'<br>').replace(/    /g,'&nbsp;&nbsp;&nbsp;&nbsp;')}function appTerm(t){const e=document.createElement('p');e.innerHTML=fmt(t),term.appendChild(e),term.scrollTop=term.scrollHeight}function appLog(t){const e=document.createElement('div');e.classList.add('interaction'),e.innerHTML=`<p class=timestamp>$${new Date(t.timestamp).toLocaleString()}</p><p class=agent>@$${t.social_handle} ($${t.agent})</p><p class=topic>Topic: $${fmt(t.topic)}</p><pre>$${t.response_html||fmt(t.response)}</pre>`,logDiv.appendChild(e),logDiv.scrollTop=logDiv.scrollHeight}function updSyn(t){synDiv.innerHTML=`<h2>Daily Synopsis</h2><pre>$${fmt(t)}</pre>`}function connSock(){const t=window.location.protocol==='https:'?'wss:':'ws:',e=document.domain||window.location.hostname||'localhost',o=$ws_port;sock=new WebSocket(`$${t}//$${e}:$${o}`),sock.onopen=function(t){statDiv.textContent='Live feed connected.';statDiv.style.color='#3c3';statDiv.style.backgroundColor='#001a00';console.log('WS connected');appTerm('WS connected.')},sock.onmessage=function(t){try{const e=JSON.parse(t.data);'interaction'===e.type?appLog(e.content):'synopsis'===e.type?updSyn(e.content):'message'===e.type&&appTerm(e.content)}catch(e){console.error('Error parsing JSON/UI update:',e,'Data:',t.data);appTerm(`Error processing message: $${t.data}`)}},sock.onclose=function(t){statDiv.textContent='Live feed disconnected. Retrying in 5s...';statDiv.style.color='#f33';statDiv.style.backgroundColor='#1a0000';console.log('WS closed. Reconnecting...');appTerm('WS closed. Reconnecting...');setTimeout(connSock,5e3)},sock.onerror=function(t){console.error('WS error:',t);statDiv.textContent='WS conn error.';statDiv.style.color='#f33';appTerm(`WS error: $${t.message||'Unknown'}`)}}connSock();</script></body></html>")
+
+@functools.lru_cache(maxsize=4)
+def _render_html_page(ws_port: int) -> tuple:
+    """(page, blake2b digest) for `ws_port`; the page only depends on the port, so it is rendered and hashed once per port."""
+    html = _HTML_TEMPLATE.substitute(ws_port=ws_port)
+    return html, hashlib.blake2b(html.encode(), digest_size=8).digest()
+
+def _to_html(text: str) -> str:
+    """Server-side equivalent of the page's `fmt`, so the browser can insert a response without re-escaping it."""
+    return html_escape(str(text), quote=False).replace("\n", "<br>").replace("    ", "&nbsp;" * 4)
+
+_genai_api_key: Optional[str] = None
+def _configure_genai(api_key: str):
+    """Configures google.generativeai once per key; reconfiguring drops the SDK's cached clients and their connections."""
+    global _genai_api_key
+    if api_key != _genai_api_key: genai.configure(api_key=api_key); _genai_api_key = api_key
+
+@functools.lru_cache(maxsize=None)
+def _shared_model(api_key: str, model_name: str = 'gemini-pro'):
+    """One GenerativeModel per (key, model) for the whole process; agents differ only in their prompts."""
+    _configure_genai(api_key); return genai.GenerativeModel(model_name)
+
+class PromptCache:
+    """Thread-safe LRU cache of model responses keyed by a prompt digest, with per-entry TTL."""
+    def __init__(self, maxsize: int = 512, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict() # key -> (stored_at, response), least recently used first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(prompt: str) -> bytes:
+        return hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = self._key(prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None: return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, prompt: str, response: str):
+        key = self._key(prompt)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize: self._entries.popitem(last=False)
+
+class AnalysisCache:
+    """TTL cache for token analysis API results (GoPlus/DexScreener), bounded to `maxsize` entries. Concurrent requests for one key share a single fetch."""
+    def __init__(self, ttl: float = 900, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[str, tuple] = {} # key -> (stored_at, value), oldest stored first
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl: return entry[1]
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._fetch(key, fetch))
+        return await asyncio.shield(task) # A cancelled waiter must not cancel the fetch others are waiting on
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+            if value: self._store(key, time.time(), value) # Failed/empty results are not cached, so they are retried next time
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: str, ts: float, value: Any):
+        self._entries.pop(key, None) # Re-insert so dict order is oldest-stored first
+        self._entries[key] = (ts, value)
+        if len(self._entries) > self.maxsize:
+            now = time.time()
+            self._entries = {k: e for k, e in self._entries.items() if now - e[0] < self.ttl} # Drop expired entries first
+            while len(self._entries) > self.maxsize: del self._entries[next(iter(self._entries))]
+
+    def to_dict(self) -> Dict[str, list]:
+        now = time.time()
+        return {k: [ts, v] for k, (ts, v) in self._entries.items() if now - ts < self.ttl}
+
+    def load(self, entries: Dict[str, list]):
+        now = time.time()
+        for k, (ts, v) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if now - ts < self.ttl: self._store(k, ts, v)
 
 class AIAgent:
     """
@@ -157,7 +315,8 @@ class AIAgent:
     Aware of token analysis features and different blockchain types for trades.
     """
     def __init__(self, name: str, role: str, api_key: str, social_handle: str,
-                 valid_chain_names_for_analysis: Optional[List[str]] = None):
+                 valid_chain_names_for_analysis: Optional[List[str]] = None, prompt_cache: Optional[PromptCache] = None,
+                 model_semaphore: Optional[asyncio.Semaphore] = None, model_retries: int = 2):
         """
         Initializes an AI Agent.
         Args:
@@ -167,22 +326,18 @@ class AIAgent:
             social_handle: Social media handle for the agent.
             valid_chain_names_for_analysis: List of chain names agents can request analysis for.
                                             This is typically derived from AgentGroup's CHAIN_NAME_TO_ID_MAP.
+            prompt_cache: Optional shared cache; identical prompts reuse an earlier response instead of calling the model.
+            model_semaphore: Optional semaphore shared by all agents to cap concurrent async model calls.
+            model_retries: Retries (with jittered exponential backoff) for async model calls failing with a transient error, e.g. 429.
         """
         self.name = name; self.role = role; self.social_handle = social_handle
-        genai.configure(api_key=api_key); self.model = genai.GenerativeModel('gemini-pro')
+        self.model = _shared_model(api_key)
         self.valid_chain_names_for_analysis = valid_chain_names_for_analysis or \
             ["ethereum", "bsc", "polygon", "arbitrum", "base", "solana", "sepolia", "polygon_mumbai"] # Fallback
-
-    def process_input(self, input_text: str, context: Dict) -> str:
-        """
-        Generates a response based on input text and current context.
-        Guides agent to use token analysis before proposing trades for EVM or Solana.
-        """
-        prompt_context = context.copy()
-        prompt_context['valid_analysis_chain_names'] = self.valid_chain_names_for_analysis # Ensure this is in prompt
-        prompt = f"""As AI Agent '{self.name}' (@{self.social_handle}), your role is '{self.role}'.
-Context: {json.dumps(prompt_context, indent=2, default=str)}
-Input: "{input_text}"
+        self.prompt_cache = prompt_cache; self.model_semaphore = model_semaphore; self.model_retries = max(0, model_retries)
+        # Static prompt text, built once per agent; only the context, input and transaction vary per call.
+        self._input_head = f"As AI Agent '{self.name}' (@{self.social_handle}), your role is '{self.role}'.\nContext: "
+        self._input_instructions = f"""
 
 **Critical Instructions:**
 1.  **Consult Analysis:** Before proposing trades or actions, CHECK `available_token_analyses_summary`.
@@ -196,54 +351,159 @@ Input: "{input_text}"
     (Example: `TRADE: So11111111111111111111111111111111111111112 EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v 100000000 solana jupiter` for 0.1 SOL to USDC. AMOUNT IS ATOMIC.)
 
 Your Response:"""
-        try: return self.model.generate_content(prompt).text
+        self._vote_head = f"As AI Agent '{self.name}' ({self.role}), evaluate proposed transaction:\n"
+        self._vote_instructions = """
+
+**Critical Voting Instructions:**
+- REVIEW `available_token_analyses_summary` in Context for involved assets (check by output token address/mint).
+- REJECT if analysis indicates high risk (e.g., `is_honeypot: true` for EVM, `is_solana_major_risk: true` for Solana, taxes > 20%, critical warnings) unless proposer gives compelling, explicit justification for the risk.
+- Your reasoning MUST state if you consulted analysis and how findings influenced your vote."""
+
+    def _generate(self, prompt: str) -> str:
+        """Calls the model, serving repeated prompts from `prompt_cache` when one is configured. Errors are not cached."""
+        if self.prompt_cache is not None:
+            cached = self.prompt_cache.get(prompt)
+            if cached is not None: return cached
+        text = self.model.generate_content(prompt).text
+        if self.prompt_cache is not None: self.prompt_cache.put(prompt, text)
+        return text
+
+    async def _generate_async(self, prompt: str) -> str:
+        """Async counterpart of `_generate` using the model's native async client (no worker thread). Transient API errors are retried."""
+        if self.prompt_cache is not None:
+            cached = self.prompt_cache.get(prompt)
+            if cached is not None: return cached
+        for attempt in range(self.model_retries + 1):
+            try:
+                if self.model_semaphore is None: text = (await self.model.generate_content_async(prompt)).text
+                else:
+                    async with self.model_semaphore: text = (await self.model.generate_content_async(prompt)).text
+                break
+            except _TRANSIENT_GEMINI_ERRORS as e:
+                if attempt == self.model_retries: raise
+                delay = min(30, 2 ** attempt) * random.uniform(0.5, 1.0) # Backoff sleeps outside the semaphore
+                print(f"Gemini {type(e).__name__} for {self.name}; retry {attempt+1}/{self.model_retries} in {delay:.1f}s."); await asyncio.sleep(delay)
+        if self.prompt_cache is not None: self.prompt_cache.put(prompt, text)
+        return text
+
+    def _input_prompt(self, input_text: str, context_json: str) -> str:
+        """
+        Builds the discussion prompt for `input_text`.
+        Guides agent to use token analysis before proposing trades for EVM or Solana.
+        """
+        return f"{self._input_head}{context_json}\nInput: \"{input_text}\"{self._input_instructions}"
+
+    def _vote_prompt(self, transaction: Dict, context_json: str) -> str:
+        """
+        Builds the voting prompt for `transaction`.
+        Guides agent to use token analysis (EVM or Solana) for voting.
+        """
+        return f"{self._vote_head}{_dumps(transaction)}{self._vote_instructions}\n\nContext: {context_json}\nYour Vote (Format: \"APPROVE\" or \"REJECT\", then reasoning on new lines):"
+
+    def process_input(self, input_text: str, context_json: str) -> str:
+        """
+        Generates a response based on input text and current context.
+        `context_json` is the already-serialized shared context (see `AgentGroup.context_json`).
+        """
+        try: return self._generate(self._input_prompt(input_text, context_json))
         except Exception as e: print(f"Error in {self.name} (process_input): {e}"); return f"Error: {e}"
 
-    def vote_on_transaction(self, transaction: Dict, context: Dict) -> str:
+    def vote_on_transaction(self, transaction: Dict, context_json: str) -> str:
         """
         Generates a vote (APPROVE/REJECT) and reasoning for a proposed transaction.
-        Guides agent to use token analysis (EVM or Solana) for voting.
+        `context_json` is the already-serialized shared context (see `AgentGroup.context_json`).
         """
-        prompt = f"""As AI Agent '{self.name}' ({self.role}), evaluate proposed transaction:
-{json.dumps(transaction, indent=2)}
+        try: return self._generate(self._vote_prompt(transaction, context_json))
+        except Exception as e: print(f"Error in {self.name} (vote): {e}"); return f"REJECT - Error: {e}"
 
-**Critical Voting Instructions:**
-- REVIEW `available_token_analyses_summary` in Context for involved assets (check by output token address/mint).
-- REJECT if analysis indicates high risk (e.g., `is_honeypot: true` for EVM, `is_solana_major_risk: true` for Solana, taxes > 20%, critical warnings) unless proposer gives compelling, explicit justification for the risk.
-- Your reasoning MUST state if you consulted analysis and how findings influenced your vote.
+    async def process_input_async(self, input_text: str, context_json: str) -> str:
+        """Async `process_input` via `generate_content_async`, so agent turns can be gathered on the event loop."""
+        try: return await self._generate_async(self._input_prompt(input_text, context_json))
+        except Exception as e: print(f"Error in {self.name} (process_input): {e}"); return f"Error: {e}"
 
-Context: {json.dumps(context, indent=2, default=str)}
-Your Vote (Format: "APPROVE" or "REJECT", then reasoning on new lines):"""
-        try: return self.model.generate_content(prompt).text
+    async def vote_on_transaction_async(self, transaction: Dict, context_json: str) -> str:
+        """Async `vote_on_transaction` via `generate_content_async`; cancelling it abandons the request."""
+        try: return await self._generate_async(self._vote_prompt(transaction, context_json))
         except Exception as e: print(f"Error in {self.name} (vote): {e}"); return f"REJECT - Error: {e}"
 
 class CryptoPortfolio:
-    def __init__(self): self.holdings:Dict[str,float]={}; self.transaction_history:List[Dict]=[]
+    def __init__(self,max_history:int=1000):
+        self.holdings:Dict[str,float]={}; self.transaction_history:deque=deque(maxlen=max_history) # Oldest entries roll off
+        self.version=0; self._summary_cache:tuple=(None,-1) # (summary_json, version it was built for)
     def update_holding(self,sym:str,amt:float):
-        bal=self.holdings.get(sym,0.0)+amt
+        self.version+=1; bal=self.holdings.get(sym,0.0)+amt
         if abs(bal)<1e-12: self.holdings.pop(sym,None)
         else: self.holdings[sym]=bal;
         self.transaction_history.append({"date":datetime.now().isoformat(),"crypto":sym,"amt_chg":amt,"new_bal":self.holdings.get(sym,0.0)})
-    def get_portfolio_summary(self)->str: return json.dumps(self.holdings)
-    def get_transaction_history(self)->str: return json.dumps(self.transaction_history)
+    def get_portfolio_summary(self)->str:
+        if self._summary_cache[1]!=self.version: self._summary_cache=(_dumps(self.holdings),self.version)
+        return self._summary_cache[0]
+    def get_transaction_history(self)->str: return _dumps(list(self.transaction_history))
 
 class MultisigWallet:
-    def __init__(self,agents:List[AIAgent],req_sigs:int): self.agents=agents;self.required_signatures=req_sigs;self.pending_transactions:List[Dict]=[]
-    def propose_transaction(self,tx_data:Dict):tx_id=f"tx_{int(time.time())}_{random.randint(1000,9999)}";self.pending_transactions.append({"id":tx_id,"transaction":tx_data,"votes":[],"status":"pending"});print(f"Tx proposed (ID:{tx_id}): {json.dumps(tx_data)}")
-    def vote_on_transactions(self,ctx:Dict):
-        for tx_w in self.pending_transactions:
-            if tx_w["status"]=="pending":
-                voted=[v['agent']for v in tx_w['votes']];[tx_w["votes"].append({"agent":a.name,"vote":(v_resp:=a.vote_on_transaction(tx_w["transaction"],ctx))})or print(f"Agent {a.name} voted on Tx {tx_w['id']}:'{v_resp.splitlines()[0]}'")for a in self.agents if a.name not in voted]
-                appr=sum(1 for v in tx_w["votes"]if v["vote"].strip().upper().startswith("APPROVE"));rej=sum(1 for v in tx_w["votes"]if v["vote"].strip().upper().startswith("REJECT"));n_ags=len(self.agents)
-                if appr>=self.required_signatures:tx_w["status"]="approved";print(f"Tx {tx_w['id']} APPROVED ({appr}/{n_ags}).")
-                elif rej>(n_ags-self.required_signatures)or len(tx_w['votes'])==n_ags:tx_w["status"]="rejected";print(f"Tx {tx_w['id']} REJECTED (A:{appr},R:{rej},V:{len(tx_w['votes'])}).")
-    def get_approved_transactions(self)->List[Dict]:return[tx_w for tx_w in self.pending_transactions if tx_w["status"]=="approved"]
-    def mark_transaction_processed(self,tx_id:str,status:str,hash_val:Optional[str]=None,err_msg:Optional[str]=None):
-        for tx_w in self.pending_transactions:
-            if tx_w["id"]==tx_id:tx_w["status"]=status;hash_val and setattr(tx_w,'tx_hash',hash_val);err_msg and setattr(tx_w,'error_message',err_msg);print(f"Tx {tx_id} status:{status}");break
+    def __init__(self,agents:List[AIAgent],req_sigs:int,fast_path_simulated:bool=False,archive_max:int=200):
+        self.agents=agents;self.required_signatures=req_sigs;self.pending_transactions:List[Dict]=[]
+        self.fast_path_simulated=fast_path_simulated # Auto-approve simulated (off-chain) txs without an LLM vote
+        self._by_id:Dict[str,Dict]={};self.archive:deque=deque(maxlen=archive_max) # id -> live tx wrapper; most recent finalized wrappers moved out of pending_transactions
+        self.archived_total=0 # Wrappers ever archived; with `archive` dropping old entries, callers track their position by this count
+        self._finalized:List[Dict]=[] # Wrappers finalized since the last clear_finalized_transactions, in finalization order
+        self._open:Dict[str,Dict[str,Dict]]={"pending":{},"approved":{}} # status -> {id: wrapper}, insertion-ordered
+        self._tx_prefix=f"tx_{time.time_ns():x}_";self._tx_counter=itertools.count() # Ids unique per process start, no per-proposal clock/RNG
+    def load_transactions(self,tx_wrappers:List[Dict]):
+        for tx_w in tx_wrappers:tx_w["_voted"]={v["agent"]for v in tx_w["votes"]}
+        self.pending_transactions=tx_wrappers;self._by_id={tx_w["id"]:tx_w for tx_w in tx_wrappers}
+        self._finalized=[tx_w for tx_w in tx_wrappers if tx_w["status"]not in self._open]
+        self._open={st:{tx_w["id"]:tx_w for tx_w in tx_wrappers if tx_w["status"]==st}for st in self._open}
+    def _set_status(self,tx_w:Dict,status:str):
+        """Single place a live tx changes status; keeps the open-status index and `_finalized` in step."""
+        old=tx_w.get("status")
+        if old in self._open:self._open[old].pop(tx_w["id"],None)
+        tx_w["status"]=status
+        if status in self._open:self._open[status][tx_w["id"]]=tx_w
+        elif old is None or old in self._open:self._finalized.append(tx_w)
+    def _is_decided(self,tx_w:Dict)->bool:return tx_w["tally"]["APPROVE"]>=self.required_signatures or tx_w["tally"]["REJECT"]>len(self.agents)-self.required_signatures
+    def _record_vote(self,tx_w:Dict,a:AIAgent,v_resp:str):
+        m=_VERDICT_RE.match(v_resp);verdict=m.group(1).upper()if m else"UNKNOWN";first_line=v_resp.partition("\n")[0]
+        tx_w["votes"].append({"agent":a.name,"vote":v_resp,"verdict":verdict});tx_w["_voted"].add(a.name)
+        if verdict in tx_w["tally"]:tx_w["tally"][verdict]+=1 # Running counts so tallying doesn't rescan votes
+        print(f"Agent {a.name} voted on Tx {tx_w['id']}:'{first_line}'")
+    async def _collect_votes(self,tx_w:Dict,ctx_json:str):
+        """Requests votes from agents that haven't voted on `tx_w`; outstanding requests are cancelled once the outcome is decided."""
+        tasks={asyncio.create_task(a.vote_on_transaction_async(tx_w["transaction"],ctx_json)):a for a in self.agents if a.name not in tx_w["_voted"]}
+        try:
+            while tasks and not self._is_decided(tx_w):
+                done,_=await asyncio.wait(tasks,return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    a=tasks.pop(t);exc=t.exception();self._record_vote(tx_w,a,f"REJECT - Error: {exc}"if exc else t.result())
+        finally:
+            for t in tasks:t.cancel()
+            if tasks:print(f"Tx {tx_w['id']} decided early; skipped {len(tasks)} remaining vote(s).")
+    def propose_transaction(self,tx_data:Dict):
+        tx_id=f"{self._tx_prefix}{next(self._tx_counter):x}";tx_w={"id":tx_id,"transaction":tx_data,"votes":[],"tally":{"APPROVE":0,"REJECT":0},"_voted":set()};self._set_status(tx_w,"pending");self.pending_transactions.append(tx_w);self._by_id[tx_id]=tx_w;print(f"Tx proposed (ID:{tx_id}): {_dumps(tx_data)}")
+        if self.fast_path_simulated and tx_data.get("simulated"):tx_w["votes"].append({"agent":"policy_engine","vote":"APPROVE - simulated fast-path","verdict":"APPROVE"});self._set_status(tx_w,"approved");print(f"Tx {tx_id} auto-approved (simulated fast-path).")
+    async def vote_on_transactions(self,ctx_json:str):
+        """Collects outstanding agent votes for every pending tx concurrently, then tallies each tx. `ctx_json` is the serialized shared context."""
+        pending=list(self._open["pending"].values())
+        await asyncio.gather(*(self._collect_votes(tx_w,ctx_json)for tx_w in pending))
+        for tx_w in pending:
+            appr,rej=tx_w["tally"]["APPROVE"],tx_w["tally"]["REJECT"];n_ags=len(self.agents)
+            if appr>=self.required_signatures:self._set_status(tx_w,"approved");print(f"Tx {tx_w['id']} APPROVED ({appr}/{n_ags}).")
+            elif rej>(n_ags-self.required_signatures)or len(tx_w['votes'])==n_ags:self._set_status(tx_w,"rejected");print(f"Tx {tx_w['id']} REJECTED (A:{appr},R:{rej},V:{len(tx_w['votes'])}).")
+    def get_approved_transactions(self)->List[Dict]:return list(self._open["approved"].values())
+    def mark_transaction_processed(self,tx_id:str,status:str,tx_hash:Optional[str]=None,error_message:Optional[str]=None):
+        tx_w=self._by_id.get(tx_id)
+        if tx_w is None:print(f"Tx {tx_id} not found; status {status} not recorded.");return
+        self._set_status(tx_w,status)
+        if tx_hash:tx_w["tx_hash"]=tx_hash
+        if error_message:tx_w["error_message"]=error_message
+        print(f"Tx {tx_id} status:{status}")
     def clear_finalized_transactions(self):
-        pre_count=len(self.pending_transactions);self.pending_transactions=[tx for tx in self.pending_transactions if tx["status"]in["pending","approved"]]
-        if pre_count - len(self.pending_transactions)>0: print(f"Cleared {pre_count - len(self.pending_transactions)} finalized txs.")
+        """Moves txs finalized since the last call (executed/failed/rejected) from pending_transactions into `archive`."""
+        if not self._finalized:return
+        done_ids={tx_w["id"]for tx_w in self._finalized}
+        self.pending_transactions=[tx_w for tx_w in self.pending_transactions if tx_w["id"]not in done_ids]
+        for tx_id in done_ids:self._by_id.pop(tx_id,None)
+        self.archive.extend(self._finalized);self.archived_total+=len(self._finalized);print(f"Archived {len(self._finalized)} finalized txs.");self._finalized=[]
 
 class AgentGroup:
     """
@@ -252,11 +512,11 @@ class AgentGroup:
     Includes safety checks based on token analysis before proposing trades.
     WARNING: Live trading risks apply if configured for mainnet.
     """
-    SAFE_OUTPUT_TOKENS_BY_CHAIN: Dict[str, List[str]] = { # Case-insensitive checks will be done by lowercasing these
+    SAFE_OUTPUT_TOKENS_BY_CHAIN: Dict[str, frozenset] = _freeze_safe_tokens({ # Normalized with _token_key at class load
         "ethereum":["0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2","0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48","0xdac17f958d2ee523a2206206994597c13d831ec7","0x6b175474e89094c44da98b954eedeac495271d0f"],
         "polygon":["0x0d500b1d8e8ef31e21c99d1db9a6444d3adf1270","0x3c499c542cef5e3811e1192ce70d8cc03d5c3359","0xc2132d05d31c914a87c6611c10748aeb04b58e8f"],
         "solana": ["So11111111111111111111111111111111111111112", "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v", "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB", "Gh9ZwEmdLJ8DscKNTkTqPbNwLNNBjuSzaG9Vp2KGtKJr"]
-    }
+    })
 
     def __init__(self, agents_definitions: List[Dict], initial_simulated_btc_amount: float):
         self.evm_config = load_config(); self.solana_config_loaded = solana_utils_load_config()
@@ -273,8 +533,13 @@ class AgentGroup:
         })
         gemini_api_key = os.getenv("GEMINI_API_KEY")
         valid_chains = list(self.CHAIN_NAME_TO_ID_MAP.keys())
-        self.agents = [AIAgent(d["name"],d["role"],gemini_api_key,d["social_handle"],valid_chain_names_for_analysis=valid_chains) for d in agents_definitions]
-        self.portfolio=CryptoPortfolio(); self.simulated_fund_usd=0.0
+        prompt_cache = PromptCache(self.evm_config.get("prompt_cache_size",512),self.evm_config.get("prompt_cache_ttl_seconds",300)) if self.evm_config.get("enable_prompt_cache",False) else None # Opt-in: it replays an agent's earlier answer verbatim
+        self._analysis_sem=asyncio.Semaphore(max(1,self.evm_config.get("analysis_concurrency",8))) # Concurrent ANALYZE_TOKEN lookups (GoPlus/DexScreener rate limits)
+        self._token_symbols_upper={net:{sym.upper():addr for sym,addr in toks.items()}for net,toks in self.evm_config.get("token_addresses",{}).items()} # Symbol -> address per network, built once for propose_trade
+        self.analysis_cache=AnalysisCache(self.evm_config.get("token_analysis_cache_ttl_seconds",900),self.evm_config.get("token_analysis_cache_size",1024)) # GoPlus/DexScreener results, persisted with state
+        model_sem = asyncio.Semaphore(max(1,self.evm_config.get("gemini_concurrency",8))) # Shared cap on in-flight Gemini calls (rate limits)
+        self.agents = [AIAgent(d["name"],d["role"],gemini_api_key,d["social_handle"],valid_chain_names_for_analysis=valid_chains,prompt_cache=prompt_cache,model_semaphore=model_sem,model_retries=self.evm_config.get("gemini_max_retries",2)) for d in agents_definitions]
+        self.portfolio=CryptoPortfolio(self.evm_config.get("portfolio_history_max_entries",1000)); self.simulated_fund_usd=0.0
         if initial_simulated_btc_amount > 0: self.portfolio.update_holding("BTC", initial_simulated_btc_amount)
 
         self.context:Dict[str,Any]={
@@ -286,84 +551,164 @@ class AgentGroup:
         }
         num_agents=len(self.agents);def_req_sigs=1 if num_agents<=1 else min(num_agents,2)
         req_sigs=max(1,min(num_agents,self.evm_config.get("multisig_required_signatures",def_req_sigs)))
-        self.multisig_wallet=MultisigWallet(self.agents,required_signatures=req_sigs)
-        self.discussion_log:List[Dict]=[];self.current_day=1;self.websocket_clients=set();self.synopsis="";self.discussion_state_file="discussion_state.json"
+        self.multisig_wallet=MultisigWallet(self.agents,req_sigs,fast_path_simulated=self.evm_config.get("fast_path_simulated",True),
+                                            archive_max=self.evm_config.get("tx_archive_max_entries",200))
+        self.discussion_log:deque=deque(maxlen=self.evm_config.get("discussion_retention",2000)) # Recent window only; full history is in the journal
+        self.current_day=1;self.websocket_clients=set();self.synopsis="";self.discussion_state_file="discussion_state.json"
+        self.discussion_journal_file="discussion_state.journal.jsonl";self._journal=None # Append-only discussion_log journal, opened lazily
+        self._html_digest=None # blake2b digest of the last HTML page written by generate_seo_friendly_html
+        self._synopsis_archive_mark=0 # multisig_wallet.archived_total already covered by a synopsis
+        self._context_json_cache:Optional[str]=None;self._context_dirty=True
+        self._live_prices:Dict[str,Dict]={} # Latest Pyth prices; copied into context["prices"] once per round, not per tick
+        self.max_analyses_in_context=max(1,self.evm_config.get("max_token_analyses_in_context",15)) # LRU cap on per-token analysis entries in the prompt context
+        self._w3_cache:Dict[str,Any]={};self._evm_wallet_cache:Dict[str,Any]={} # One Web3/account per network for the process lifetime
+        self._trade_pool=ThreadPoolExecutor(max_workers=self.evm_config.get("trade_workers",4),thread_name_prefix="trade") # Blocking web3 calls
+        self._push_queue:Optional[asyncio.Queue]=None;self._push_workers:List[asyncio.Task]=[] # Started lazily on first push
+        self._http_session:Optional[aiohttp.ClientSession]=None # Shared keep-alive session for outbound HTTP, created on first use
+
+    def _touch_context(self):
+        """Marks `self.context` as mutated so the next `context_json()` call re-serializes it."""
+        self._context_dirty=True
+
+    def _snapshot_prices(self):
+        """Copies the streamed prices into the context if they moved since the last round; the cached context JSON is kept otherwise."""
+        if self._live_prices and self._live_prices!=self.context.get("prices"):self.context["prices"]=dict(self._live_prices);self._touch_context()
+
+    def _sync_portfolio_context(self):
+        """Refreshes the portfolio entries in the context, invalidating the context JSON only if holdings or fund changed."""
+        summary=self.portfolio.get_portfolio_summary()
+        if self.context.get("portfolio_summary")!=summary or self.context.get("simulated_fund_usd")!=self.simulated_fund_usd:
+            self.context["portfolio_summary"]=summary;self.context["simulated_fund_usd"]=self.simulated_fund_usd;self._touch_context()
+
+    def _touch_analysis(self,token_addr:Optional[str]=None):
+        """Moves `token_addr` to the most-recent end of the analysis dicts, then evicts the least recently referenced beyond `max_token_analyses_in_context`."""
+        for d in (self.context["available_token_analyses_summary"],self.context["token_analysis_reports"]):
+            if token_addr in d:d[token_addr]=d.pop(token_addr)
+            while len(d)>self.max_analyses_in_context:del d[next(iter(d))]
+
+    def context_json(self)->str:
+        """Serialized `self.context` for prompts; re-dumped only after `_touch_context()`, shared by every agent call in between."""
+        if self._context_dirty or self._context_json_cache is None:
+            self._context_json_cache=_dumps({k:v for k,v in self.context.items()if k!="token_analysis_reports"});self._context_dirty=False # Agents read the summaries; full reports stay server-side
+        return self._context_json_cache
+
+    async def run_discussion_round(self, topics: List[str]) -> List[str]:
+        """
+        Runs one discussion round. `topics` is aligned with `self.agents`; every agent answers its topic
+        concurrently (one Gemini call each), interactions are logged in agent order, and the responses are
+        then parsed for commands in a single `update_context_with_responses` pass.
+        """
+        self._snapshot_prices()
+        ctx_json = self.context_json()
+        responses = await asyncio.gather(*(a.process_input_async(t, ctx_json) for a, t in zip(self.agents, topics)))
+        for agent, topic, response in zip(self.agents, topics, responses): await self.log_interaction(agent, topic, response)
+        await self.update_context_with_responses(responses)
+        return responses
+
+    def generate_topic_for_agent(self, agent: AIAgent) -> str:
+        """Picks a discussion topic for `agent` from the precomputed topic templates."""
+        tmpl = random.choice(_TOPICS_BASE)
+        return tmpl.format(token=random.choice(_TOPIC_TOKENS)) if "{token}" in tmpl else tmpl
+
+    async def _analyze_one(self, token_addr: str, chain_name: str):
+        """Fetches the GoPlus security report and DexScreener pairs for one token concurrently, then writes both into the context.
+        Results are collected locally and merged in one step at the end: concurrent analyses may evict this token's entries while its fetches are in flight."""
+        await self.log_message(f"Agent requested analysis: {token_addr} on {chain_name}", "INFO")
+        if chain_name not in self.CHAIN_NAME_TO_ID_MAP:
+            await self.log_message(f"Unsupported chain for analysis: {chain_name}. Valid: {list(self.CHAIN_NAME_TO_ID_MAP.keys())}", "WARN")
+            self.context["available_token_analyses_summary"].setdefault(token_addr,{})["error"]=f"Unsupported chain: {chain_name}"; self._touch_analysis(token_addr); return
+
+        report:Dict[str,Any]={};summary:Dict[str,Any]={} # Merged into the context once both lookups are processed
+
+        goplus_id = self.CHAIN_NAME_TO_ID_MAP[chain_name].get("goplus")
+        dex_chain_name = self.CHAIN_NAME_TO_ID_MAP[chain_name].get("dexscreener")
+        addr_key = _token_key(token_addr, chain_name)
+        fetches = {} # The two lookups are independent, so both HTTP round-trips overlap
+        if goplus_id: fetches["security"] = self.analysis_cache.get_or_fetch(f"security|{goplus_id}|{addr_key}", lambda: fetch_token_security_report(token_addr, goplus_id))
+        async def fetch_pairs() -> List[PairReport]: # DexScreener call is sync; slimmed before it is cached, persisted or stored in the context
+            return [{k: p.get(k) for k in _PAIR_FIELDS} for p in await asyncio.to_thread(fetch_pairs_for_token, token_addr, dex_chain_name) or []]
+        if dex_chain_name: fetches["pairs"] = self.analysis_cache.get_or_fetch(f"pairs|{dex_chain_name}|{addr_key}", fetch_pairs)
+        results = dict(zip(fetches, await asyncio.gather(*fetches.values(), return_exceptions=True)))
+
+        if "security" in results:
+            security_report: Optional[TokenSecurityReport] = results["security"]
+            if isinstance(security_report, Exception):
+                await self.log_message(f"Error fetching GoPlus security report for {token_addr}: {type(security_report).__name__} - {security_report}", "ERROR"); security_report = None
+            if security_report:
+                report["security"] = security_report
+                # Create a concise summary for the LLM context based on chain type
+                if chain_name == "solana": # Solana specific summary
+                    sec_summary = {
+                        "is_solana_major_risk": security_report.get("is_honeypot"), # is_honeypot is derived for Solana
+                        "transfer_tax_percent": (security_report.get("transfer_tax") or 0) * 100 if security_report.get("transfer_tax") is not None else None,
+                        "is_mintable": security_report.get("is_mintable"),
+                        "is_freezable": security_report.get("is_trading_pausable"), # Mapped from freezable
+                        "warnings_count": len(security_report.get("warnings", [])),
+                        "top_warnings": security_report.get("warnings", [])[:2],
+                        "retrieved_at": security_report.get("retrieved_at")
+                    }
+                else: # EVM summary
+                    sec_summary = {
+                        "is_honeypot":security_report.get("is_honeypot"),
+                        "buy_tax_percent":(security_report.get("buy_tax")or 0)*100,
+                        "sell_tax_percent":(security_report.get("sell_tax")or 0)*100,
+                        "warnings_count":len(security_report.get("warnings",[])),
+                        "top_warnings":security_report.get("warnings",[])[:2],
+                        "retrieved_at":security_report.get("retrieved_at")
+                    }
+                summary["security_summary"] = sec_summary
+                await self.log_message(f"Security report for {token_addr} updated. Risk flags processed.", "INFO")
+            else:
+                await self.log_message(f"Failed GoPlus security report for {token_addr}.", "WARN")
+                summary["security_summary"] = "Error fetching/processing security data."
+
+        if "pairs" in results:
+            pair_reps: List[PairReport] = results["pairs"]
+            if isinstance(pair_reps, Exception):
+                await self.log_message(f"Error fetching DexScreener pairs for {token_addr}: {type(pair_reps).__name__} - {pair_reps}", "ERROR"); pair_reps = []
+            if pair_reps:
+                report["pairs"] = pair_reps
+                summary["pair_info_summary"] = {
+                    "pair_count":len(pair_reps),
+                    "total_liquidity_usd":sum(p.get('liquidity_usd',0)or 0 for p in pair_reps),
+                    "top_pair_liq_usd":pair_reps[0].get("liquidity_usd")if pair_reps else None,
+                    "newest_pair_creation_ts":pair_reps[0].get("pair_created_at")if pair_reps else None
+                }
+                await self.log_message(f"Pair reports for {token_addr} updated (Count: {len(pair_reps)}).","INFO")
+            else:
+                await self.log_message(f"Failed DexScreener pairs for {token_addr}.","WARN")
+                summary["pair_info_summary"] = "Error fetching pair data."
+
+        # No await from here on, so the merge and the eviction it triggers happen together
+        self.context["token_analysis_reports"].setdefault(token_addr,{}).update(report)
+        self.context["available_token_analyses_summary"].setdefault(token_addr,{}).update(summary)
+        self._touch_analysis(token_addr)
 
     async def update_context_with_responses(self, responses: List[str]):
         """
         Processes agent responses for commands (TRADE, ANALYZE_TOKEN) and updates shared context.
-        Token analysis fetching is now asynchronous.
+        All ANALYZE_TOKEN commands in the batch run concurrently (bounded by `analysis_concurrency`); repeated token/chain requests are fetched once.
+        TRADE commands are proposed afterwards, in order, so their pre-checks see this batch's analyses.
         """
+        requested_analyses:Dict[tuple,str]={};trades:List[str]=[];had_commands=False # (token, chain) -> response that requested it
         for response_text in responses:
-            if "TRADE:" in response_text: self.propose_trade(response_text.split("TRADE:", 1)[1].strip())
-            if "ANALYZE_TOKEN:" in response_text:
-                try:
-                    command_part = response_text.split("ANALYZE_TOKEN:",1)[1].strip(); parts = command_part.split()
-                    if len(parts)==2:
-                        token_addr, chain_name = parts[0].strip(), parts[1].strip().lower()
-                        await self.log_message(f"Agent requested analysis: {token_addr} on {chain_name}", "INFO")
-                        if chain_name not in self.CHAIN_NAME_TO_ID_MAP:
-                            await self.log_message(f"Unsupported chain for analysis: {chain_name}. Valid: {list(self.CHAIN_NAME_TO_ID_MAP.keys())}", "WARN")
-                            self.context["available_token_analyses_summary"].setdefault(token_addr,{})["error"]=f"Unsupported chain: {chain_name}"; continue
-
-                        # Initialize context storage for this token
-                        self.context["token_analysis_reports"].setdefault(token_addr,{});
-                        self.context["available_token_analyses_summary"].setdefault(token_addr,{})
-
-                        goplus_id = self.CHAIN_NAME_TO_ID_MAP[chain_name].get("goplus")
-                        dex_chain_name = self.CHAIN_NAME_TO_ID_MAP[chain_name].get("dexscreener")
-                        sec_summary = {"retrieved_at": int(time.time()), "error": "Not fetched yet"}
-
-                        if goplus_id:
-                            # fetch_token_security_report is async, so await it directly
-                            security_report: Optional[TokenSecurityReport] = await fetch_token_security_report(token_addr, goplus_id)
-                            if security_report:
-                                self.context["token_analysis_reports"][token_addr]["security"] = security_report
-                                # Create a concise summary for the LLM context based on chain type
-                                if chain_name == "solana": # Solana specific summary
-                                    sec_summary = {
-                                        "is_solana_major_risk": security_report.get("is_honeypot"), # is_honeypot is derived for Solana
-                                        "transfer_tax_percent": (security_report.get("transfer_tax") or 0) * 100 if security_report.get("transfer_tax") is not None else None,
-                                        "is_mintable": security_report.get("is_mintable"),
-                                        "is_freezable": security_report.get("is_trading_pausable"), # Mapped from freezable
-                                        "warnings_count": len(security_report.get("warnings", [])),
-                                        "top_warnings": security_report.get("warnings", [])[:2],
-                                        "retrieved_at": security_report.get("retrieved_at")
-                                    }
-                                else: # EVM summary
-                                    sec_summary = {
-                                        "is_honeypot":security_report.get("is_honeypot"),
-                                        "buy_tax_percent":(security_report.get("buy_tax")or 0)*100,
-                                        "sell_tax_percent":(security_report.get("sell_tax")or 0)*100,
-                                        "warnings_count":len(security_report.get("warnings",[])),
-                                        "top_warnings":security_report.get("warnings",[])[:2],
-                                        "retrieved_at":security_report.get("retrieved_at")
-                                    }
-                                self.context["available_token_analyses_summary"][token_addr]["security_summary"] = sec_summary
-                                await self.log_message(f"Security report for {token_addr} updated. Risk flags processed.", "INFO")
-                            else:
-                                await self.log_message(f"Failed GoPlus security report for {token_addr}.", "WARN")
-                                self.context["available_token_analyses_summary"][token_addr]["security_summary"] = "Error fetching/processing security data."
-
-                        if dex_chain_name: # DexScreener call is sync, use to_thread
-                            pair_reps: List[PairReport] = await asyncio.to_thread(fetch_pairs_for_token, token_addr, dex_chain_name)
-                            if pair_reps:
-                                self.context["token_analysis_reports"][token_addr]["pairs"] = pair_reps
-                                self.context["available_token_analyses_summary"][token_addr]["pair_info_summary"] = {
-                                    "pair_count":len(pair_reps),
-                                    "total_liquidity_usd":sum(p.get('liquidity_usd',0)or 0 for p in pair_reps),
-                                    "top_pair_liq_usd":pair_reps[0].get("liquidity_usd")if pair_reps else None,
-                                    "newest_pair_creation_ts":pair_reps[0].get("pair_created_at")if pair_reps else None
-                                }
-                                await self.log_message(f"Pair reports for {token_addr} updated (Count: {len(pair_reps)}).","INFO")
-                            else:
-                                await self.log_message(f"Failed DexScreener pairs for {token_addr}.","WARN")
-                                self.context["available_token_analyses_summary"][token_addr]["pair_info_summary"] = "Error fetching pair data."
-                    else: await self.log_message(f"Invalid ANALYZE_TOKEN format: '{command_part}'. Expected <ADDRESS_OR_MINT> <CHAIN_NAME>.","WARNING")
-                except Exception as e: await self.log_message(f"Error processing ANALYZE_TOKEN command ('{response_text}'): {type(e).__name__} - {e}",level="ERROR")
-
-        self.context["portfolio_summary"]=self.portfolio.get_portfolio_summary(); self.context["simulated_fund_usd"]=self.simulated_fund_usd
-        self.context['valid_analysis_chain_names']=list(self.CHAIN_NAME_TO_ID_MAP.keys())
+            for cmd_match in _COMMAND_RE.finditer(response_text):
+                had_commands=True
+                command, command_part = cmd_match.group(1), cmd_match.group(2).strip()
+                if command == "TRADE": trades.append(command_part); continue
+                parts = command_part.split()
+                if len(parts)==2: requested_analyses.setdefault((parts[0].strip(), parts[1].strip().lower()), response_text)
+                else: await self.log_message(f"Invalid ANALYZE_TOKEN format: '{command_part}'. Expected <ADDRESS_OR_MINT> <CHAIN_NAME>.","WARNING")
+
+        async def bounded(token_addr:str,chain_name:str):
+            async with self._analysis_sem: await self._analyze_one(token_addr, chain_name)
+        results = await asyncio.gather(*(bounded(t,c) for t,c in requested_analyses), return_exceptions=True)
+        for response_text, e in zip(requested_analyses.values(), results):
+            if isinstance(e, Exception): await self.log_message(f"Error processing ANALYZE_TOKEN command ('{response_text}'): {type(e).__name__} - {e}",level="ERROR")
+        for command_part in trades: self.propose_trade(command_part)
+
+        if had_commands: self._touch_context() # Analyses were written into the context in place
+        self._sync_portfolio_context()
 
 
     def propose_trade(self, trade_details_string: str):
@@ -373,10 +718,9 @@ class AgentGroup:
         Format SOL: <IN_MINT> <OUT_MINT> <IN_AMOUNT_ATOMIC> solana jupiter
         """
         log_func = lambda msg, level: asyncio.create_task(self.log_message(msg, level=level)) # Helper for async logging
-        parts = trade_details_string.strip().split()
-
-        if len(parts) == 5:
-            input_token_str, output_token_str, input_amount_str, network_name_str, platform_name_str = parts
+        m = _TRADE_RE.match(trade_details_string)
+        if m:
+            input_token_str, output_token_str, input_amount_str, network_name_str, platform_name_str = m.groups()
             network_name = network_name_str.lower()
             platform_name = platform_name_str.lower()
 
@@ -396,21 +740,22 @@ class AgentGroup:
 
                 if network_type == "evm":
                     # If it's an EVM chain, try to resolve symbol to address if not already an address
-                    if "0x" in token_to_check_on_risk.lower() and len(token_to_check_on_risk) == 42 : # Basic EVM address check
+                    if len(token_to_check_on_risk) == 42 and token_to_check_on_risk.startswith(("0x", "0X")): # Basic EVM address check
                         resolved_output_token_address = token_to_check_on_risk
                     else: # Assume it's a symbol, try to get address from config
-                        resolved_output_token_address = self.evm_config.get("token_addresses", {}).get(network_name, {}).get(token_to_check_on_risk.upper())
+                        resolved_output_token_address = self._token_symbols_upper.get(network_name, {}).get(token_to_check_on_risk.upper())
                 elif network_type == "solana":
                     # For Solana, agent is expected to provide the mint address directly for output_token_str
                     resolved_output_token_address = token_to_check_on_risk # Assume it's a mint address
 
                 # Check against safe list for the specific chain
-                safe_tokens_for_this_chain = [addr.lower() for addr in self.SAFE_OUTPUT_TOKENS_BY_CHAIN.get(network_name, [])]
+                safe_tokens_for_this_chain = self.SAFE_OUTPUT_TOKENS_BY_CHAIN.get(network_name, frozenset())
 
-                if resolved_output_token_address and (resolved_output_token_address.lower() not in safe_tokens_for_this_chain):
+                if resolved_output_token_address and (_token_key(resolved_output_token_address, network_name) not in safe_tokens_for_this_chain):
                     log_func(f"Pre-proposal check for non-safe output token: {resolved_output_token_address} (from '{output_token_str}') on {network_name}", "INFO")
                     # Retrieve analysis summary for the resolved address
                     analysis_data = self.context.get("available_token_analyses_summary", {}).get(resolved_output_token_address, {})
+                    if analysis_data: self._touch_analysis(resolved_output_token_address) # A trade check counts as a reference for eviction
                     security_summary = analysis_data.get("security_summary") # This is the dict we need
 
                     if isinstance(security_summary, str): # Error string from analysis
@@ -435,11 +780,11 @@ class AgentGroup:
 
                     elif not security_summary: # No analysis summary found for this specific address
                          # Heuristic to check if it looks like an address rather than a common symbol we might have missed resolving
-                        if ("0x" in resolved_output_token_address.lower() and len(resolved_output_token_address)==42) or \
+                        if (resolved_output_token_address.startswith(("0x", "0X")) and len(resolved_output_token_address)==42) or \
                            (len(resolved_output_token_address) > 30 and len(resolved_output_token_address) < 50 and network_type == "solana"):
                             log_func(f"WARNING: No analysis summary found for OUTPUT token {resolved_output_token_address}. Proposing without system safety pre-check: {trade_details_string}", "WARNING")
 
-                elif not resolved_output_token_address and not ("0x" in token_to_check_on_risk.lower() or len(token_to_check_on_risk) > 30) : # It was a symbol but not found in config
+                elif not resolved_output_token_address and not (token_to_check_on_risk.startswith(("0x", "0X")) or len(token_to_check_on_risk) > 30) : # It was a symbol but not found in config
                     log_func(f"WARNING: Output token SYMBOL '{token_to_check_on_risk}' not found in config for network '{network_name}' and is not an address. Proposing as-is.", "WARNING")
 
                 # If all checks passed or token is safe-listed or no address to check
@@ -447,172 +792,537 @@ class AgentGroup:
                                  "input_amount":input_amount_val,"network_name":network_name,"platform_name":platform_name, "chain_type":network_type}
                 self.multisig_wallet.propose_transaction(proposal_data)
             except ValueError: log_func(f"Invalid number format for trade amount: '{input_amount_str}' in '{trade_details_string}'", "WARNING")
-        elif len(parts)==3 and parts[0].upper()in["BUY","SELL"]: # Simulated legacy trade
-            action,amount_s,crypto=parts;amount=float(amount_s);self.multisig_wallet.propose_transaction({"action":action.upper(),"amount":amount,"crypto":crypto.upper(),"simulated":True})
+        elif (m := _LEGACY_TRADE_RE.match(trade_details_string)): # Simulated legacy trade
+            action,amount_s,crypto=m.groups();amount=float(amount_s);self.multisig_wallet.propose_transaction({"action":action.upper(),"amount":amount,"crypto":crypto.upper(),"simulated":True})
         else: log_func(f"Unrecognized trade proposal format: '{trade_details_string}'. Expected 5 parts for on-chain or 3 for simulated.", "WARNING")
 
+    def _get_w3(self,net_name):
+        """Returns the cached Web3 instance for `net_name`, connecting on first use or if the cached one stopped responding."""
+        w3=self._w3_cache.get(net_name)
+        if w3 is not None and not w3.is_connected():
+            print(f"Cached connection to {net_name} is unhealthy; reconnecting.");self._w3_cache.pop(net_name,None);w3=None
+        if w3 is None:
+            w3=evm_connect_to_network(net_name,config=self.evm_config)
+            if w3: self._w3_cache[net_name]=w3
+        return w3
+
+    def _get_evm_account(self,net_name):
+        """Returns (web3, wallet) for `net_name`, both cached across execution cycles. Either may be None on failure."""
+        w3=self._get_w3(net_name)
+        if not w3: return None,None
+        wallet=self._evm_wallet_cache.get(net_name)
+        if wallet is None:
+            wallet=evm_load_wallet(w3,net_name,config=self.evm_config)
+            if wallet: self._evm_wallet_cache[net_name]=wallet
+        return w3,wallet
+
+    def _prefetch_evm_snapshot(self,w3,wallet,net_name,tx_wrappers):
+        """Reads decimals/balances/allowances for every EVM trade queued on `net_name` in one multicall."""
+        txs=[w['transaction'] for w in tx_wrappers if w['transaction'].get("chain_type")=="evm" and not w['transaction'].get("simulated")]
+        routers=self.evm_config.get("dex_routers",{}).get(net_name,{})
+        spenders=[routers[t["platform_name"]] for t in txs if t.get("platform_name") in routers]
+        symbols=[sym for t in txs for sym in (t.get("input_token"),t.get("output_token")) if sym]
+        return evm_get_erc20_snapshot(w3,wallet.address,net_name,symbols,spenders,config=self.evm_config)
+
+    async def _settle_evm_trades(self, in_flight: List[tuple]):
+        """Polls the receipts of broadcast EVM swaps and records each outcome. Empties `in_flight`.
+        Polling holds a trade-pool thread for one batched RPC call at a time, so waiting never starves other networks' sends."""
+        if not in_flight: return
+        results = [None] * len(in_flight)
+        poll = self.evm_config.get("receipt_poll_seconds", 2)
+        timeout = self.evm_config.get("receipt_timeout_seconds", 300)
+        deadline = time.monotonic() + timeout
+        while True:
+            waiting = {} # w3 -> indexes of swaps still without a receipt
+            for i, (_, _, w3) in enumerate(in_flight):
+                if results[i] is None: waiting.setdefault(w3, []).append(i)
+            if not waiting: break
+            for w3, idx in waiting.items():
+                hashes = [in_flight[i][1] for i in idx]
+                try:
+                    outcomes = await self._run_trade_io(evm_get_trade_receipts, w3, hashes)
+                except Exception as e:
+                    print(f"Receipt poll failed ({type(e).__name__}: {e}); retrying.")
+                    continue
+                for i, outcome in zip(idx, outcomes): results[i] = outcome
+            if time.monotonic() >= deadline: break
+            await asyncio.sleep(poll)
+
+        # Outcomes are recorded and `in_flight` emptied with no await in between, so a cancel can't leave a tx half-settled
+        logs = []
+        for (tx_w, tx_hash, _), outcome in zip(in_flight, results):
+            tx, tx_id = tx_w['transaction'], tx_w['id']
+            if outcome is None:
+                status = "submitted_unconfirmed"
+                err_msg = f"No receipt within {timeout}s; it may still be mined."
+                logs.append((f"EVM Trade UNCONFIRMED (Tx {tx_id}): {err_msg} Hash:{tx_hash}", "WARNING"))
+            else:
+                success, msg = outcome
+                if success:
+                    status, err_msg = "executed_onchain_evm_success", None
+                    logs.append((f"EVM Trade SUCCESS (Tx {tx_id}): Hash {tx_hash}. {msg}", "INFO"))
+                    self.portfolio.update_holding(tx["input_token"], -float(tx["input_amount"]))
+                else:
+                    status, err_msg = "failed_onchain_evm_execution", msg
+                    logs.append((f"EVM Trade FAILED (Tx {tx_id}): {msg}. Hash(if any):{tx_hash}", "ERROR"))
+            self.multisig_wallet.mark_transaction_processed(tx_id, status, tx_hash=tx_hash, error_message=err_msg)
+        in_flight.clear()
+        for line, level in logs: await self.log_message(line, level)
+
+    async def _run_trade_io(self, fn, *args, **kwargs):
+        """Runs blocking chain I/O on the dedicated trade pool (not the default executor shared with other work)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._trade_pool, functools.partial(fn, *args, **kwargs))
+
     async def execute_approved_transactions(self):
         approved_tx_wrappers = self.multisig_wallet.get_approved_transactions()
         if not approved_tx_wrappers: return
         await self.log_message(f"Processing {len(approved_tx_wrappers)} approved transaction(s)...", "INFO")
-        _evm_w3,_evm_wallet,_evm_net_name = None,None,None
-        _sol_client,_sol_keypair,_sol_net_name = None,None,None
-
+        by_net = {} # Group by network: each network is connected to and pre-read once, and networks execute concurrently
         for tx_w in approved_tx_wrappers:
-            tx,tx_id = tx_w['transaction'],tx_w['id']
-            status,tx_hash,err_msg = tx_w['status'],None,None # Ensure err_msg is defined
-            await self.log_message(f"Attempting to execute Tx ID {tx_id}: {json.dumps(tx)}", "DEBUG")
-            if tx.get("simulated"): self.multisig_wallet.mark_transaction_processed(tx_id,f"executed_simulated_{tx['action'].lower()}",err_msg=err_msg); continue # Use err_msg here
-
-            chain_type, net_name = tx.get("chain_type"), tx.get("network_name")
-            if chain_type=="evm":
-                await self.log_message(f"Preparing EVM trade for Tx {tx_id} on {net_name}...", "WARNING")
-                if net_name!=_evm_net_name or not _evm_w3 or not _evm_wallet:
-                    _evm_w3=evm_connect_to_network(net_name,'config.json')
-                    if _evm_w3: _evm_wallet=evm_load_wallet(_evm_w3,net_name,'config.json'); _evm_net_name=net_name if _evm_wallet else None
-                    if not _evm_wallet: err_msg="EVM wallet/network failed.";status="failed_evm_setup";await self.log_message(err_msg,"ERROR");self.multisig_wallet.mark_transaction_processed(tx_id,status,err_msg=err_msg);continue
-                tx_hash,success,msg = await asyncio.to_thread(evm_execute_trade,_evm_w3,_evm_wallet,net_name,tx.get("platform_name"),tx["input_token"],tx["output_token"],tx["input_amount"],'config.json')
-                if success: status="executed_onchain_evm_success";await self.log_message(f"EVM Trade SUCCESS (Tx {tx_id}): Hash {tx_hash}. {msg}","INFO");self.portfolio.update_holding(tx["input_token"],-float(tx["input_amount"]))
-                else: status="failed_onchain_evm_execution";err_msg=msg;await self.log_message(f"EVM Trade FAILED (Tx {tx_id}): {msg}. Hash(if any):{tx_hash}","ERROR")
-            elif chain_type=="solana":
-                await self.log_message(f"Preparing Solana trade for Tx ID {tx_id} on {net_name} via Jupiter...","WARN")
-                sol_rpc_key=self.CHAIN_NAME_TO_ID_MAP.get(net_name,{}).get("rpc_network_key","devnet")
-                if net_name!=_sol_net_name or not _sol_client or not _sol_keypair:
-                    sol_rpc_url=get_solana_rpc_url(sol_rpc_key);_sol_keypair=load_solana_keypair()
-                    if not sol_rpc_url or not _sol_keypair:err_msg="Solana RPC/Signer not configured.";status="failed_solana_setup";await self.log_message(err_msg,"ERROR");self.multisig_wallet.mark_transaction_processed(tx_id,status,err_msg=err_msg);continue
-                    if _sol_client:await _sol_client.close() # Close previous if switching
-                    _sol_client=await get_async_solana_client(rpc_url_override=sol_rpc_url)
-                    if not _sol_client:err_msg=f"Failed to connect to Solana {sol_rpc_key} RPC.";status="failed_solana_rpc";await self.log_message(err_msg,"ERROR");self.multisig_wallet.mark_transaction_processed(tx_id,status,err_msg=err_msg);continue
-                    _sol_net_name=net_name
-                amt_atomic=int(tx["input_amount"]) # Agent must provide atomic units for Solana
-                # Define do_sol_swap_task inside execute_approved_transactions as it uses its scope
-                async def do_sol_swap_task():
-                    async with aiohttp.ClientSession() as http_session: # Session for this task
-                        quote=await fetch_jupiter_quote(tx["input_token"],tx["output_token"],amt_atomic,str(_sol_keypair.pubkey()),self.evm_config.get("solana_slippage_bps", 500),http_session)
-                        if not quote:return{"success":False,"error_message":"Failed to get Jupiter quote"}
-                        return await execute_jupiter_swap(quote,_sol_keypair,_sol_client,http_session)
-                swap_outcome = await do_sol_swap_task() # Await the task directly
-                tx_hash=swap_outcome.get("signature")
-                if swap_outcome.get("success"):status="executed_onchain_solana_success";await self.log_message(f"Solana Trade SUCCESS (Tx {tx_id}): Sig {tx_hash}. In:{swap_outcome.get('input_amount_processed')} Out:{swap_outcome.get('output_amount_processed')}","INFO");await self.log_message(f"Simulated portfolio NOT YET UPDATED for Solana trade input {tx['input_token']}.","WARN")
-                else:status="failed_onchain_solana_execution";err_msg=swap_outcome.get('error_message','Unknown Solana swap error');await self.log_message(f"Solana Trade FAILED (Tx {tx_id}): {err_msg}. Sig(if any):{tx_hash}","ERROR")
-            else: status="failed_unsupported_chain_type";err_msg=f"Unsupported chain_type '{chain_type}'";await self.log_message(f"Tx {tx_id} {err_msg}","ERROR")
-            self.multisig_wallet.mark_transaction_processed(tx_id,status,tx_hash=tx_hash,error_message=err_msg)
-        self.context["portfolio_summary"]=self.portfolio.get_portfolio_summary();self.context["simulated_fund_usd"]=self.simulated_fund_usd
+            by_net.setdefault(tx_w['transaction'].get("network_name"), []).append(tx_w)
+        results = await asyncio.gather(*(self._execute_network_batch(net_txs) for net_txs in by_net.values()), return_exceptions=True)
+        for net_name, res in zip(by_net, results):
+            if isinstance(res, Exception):
+                await self.log_message(f"Execution batch for network {net_name} aborted: {type(res).__name__} - {res}", "ERROR")
+        self._sync_portfolio_context()
         self.multisig_wallet.clear_finalized_transactions()
-        if _sol_client:await _sol_client.close();_sol_client=None;_sol_net_name=None;print("Closed active Solana client session.")
+
+    async def _fail_tx(self, tx_id: str, status: str, err_msg: str):
+        await self.log_message(err_msg, "ERROR")
+        self.multisig_wallet.mark_transaction_processed(tx_id, status, error_message=err_msg)
+
+    async def _execute_network_batch(self, net_txs: List[Dict]):
+        """Executes the approved txs of one network in order. EVM swaps are pipelined; Solana reuses one client."""
+        _evm_w3, _evm_wallet, _evm_net_name, _evm_snapshot, _evm_nonces = None, None, None, None, None
+        _sol_client, _sol_keypair, _sol_net_name = None, None, None
+        evm_in_flight = [] # Swaps broadcast but not yet confirmed
+        batch_size = max(1, self.evm_config.get("onchain_batch_size", 10))
+        evm_executing = None # Tx whose swap may be mid-broadcast; its outcome is unknown if the batch is cancelled there
+        try:
+            for tx_w in net_txs:
+                tx, tx_id = tx_w['transaction'], tx_w['id']
+                status, tx_hash, err_msg = tx_w['status'], None, None
+                await self.log_message(f"Attempting to execute Tx ID {tx_id}: {_dumps(tx)}", "DEBUG")
+                if tx.get("simulated"):
+                    self.multisig_wallet.mark_transaction_processed(tx_id, f"executed_simulated_{tx['action'].lower()}")
+                    continue
+
+                chain_type, net_name = tx.get("chain_type"), tx.get("network_name")
+                if chain_type == "evm":
+                    await self.log_message(f"Preparing EVM trade for Tx {tx_id} on {net_name}...", "WARNING")
+                    if net_name != _evm_net_name or not _evm_w3 or not _evm_wallet:
+                        _evm_w3, _evm_wallet = await self._run_trade_io(self._get_evm_account, net_name)
+                        _evm_net_name = net_name if _evm_wallet else None
+                        if not _evm_wallet:
+                            await self._fail_tx(tx_id, "failed_evm_setup", "EVM wallet/network failed.")
+                            continue
+                        _evm_snapshot = await self._run_trade_io(self._prefetch_evm_snapshot, _evm_w3, _evm_wallet, net_name, net_txs)
+                        # Seeded once per (network, wallet) per batch; approvals and swaps draw from it in order
+                        _evm_nonces = EvmNonceTracker(_evm_w3, _evm_wallet.address)
+
+                    evm_executing = tx_w
+                    try:
+                        tx_hash, success, msg = await self._run_trade_io(
+                            evm_execute_trade, _evm_w3, _evm_wallet, net_name, tx.get("platform_name"),
+                            tx["input_token"], tx["output_token"], tx["input_amount"],
+                            token_snapshot=_evm_snapshot, wait_for_receipt=False, config=self.evm_config, nonce=_evm_nonces)
+                    except Exception as e:
+                        tx_hash, success, msg = None, False, f"Trade execution error: {type(e).__name__} - {e}"
+                    evm_executing = None
+
+                    if success:
+                        evm_in_flight.append((tx_w, tx_hash, _evm_w3))
+                        await self.log_message(f"EVM Trade SUBMITTED (Tx {tx_id}): Hash {tx_hash}.", "INFO")
+                        if len(evm_in_flight) >= batch_size: await self._settle_evm_trades(evm_in_flight)
+                        continue # Marked processed once its receipt is in
+                    status, err_msg = "failed_onchain_evm_execution", msg
+                    await self.log_message(f"EVM Trade FAILED (Tx {tx_id}): {msg}. Hash(if any):{tx_hash}", "ERROR")
+
+                elif chain_type == "solana":
+                    await self.log_message(f"Preparing Solana trade for Tx ID {tx_id} on {net_name} via Jupiter...", "WARN")
+                    sol_rpc_key = self.CHAIN_NAME_TO_ID_MAP.get(net_name, {}).get("rpc_network_key", "devnet")
+                    if net_name != _sol_net_name or not _sol_client or not _sol_keypair:
+                        sol_rpc_url = get_solana_rpc_url(sol_rpc_key)
+                        _sol_keypair = load_solana_keypair()
+                        if not sol_rpc_url or not _sol_keypair:
+                            await self._fail_tx(tx_id, "failed_solana_setup", "Solana RPC/Signer not configured.")
+                            continue
+                        if _sol_client: await _sol_client.close() # Close previous if switching
+                        _sol_client = await get_async_solana_client(rpc_url_override=sol_rpc_url)
+                        if not _sol_client:
+                            await self._fail_tx(tx_id, "failed_solana_rpc", f"Failed to connect to Solana {sol_rpc_key} RPC.")
+                            continue
+                        _sol_net_name = net_name
+                    amt_atomic = int(tx["input_amount"]) # Agent must provide atomic units for Solana
+                    async with aiohttp.ClientSession() as http_session:
+                        quote = await fetch_jupiter_quote(tx["input_token"], tx["output_token"], amt_atomic, str(_sol_keypair.pubkey()),
+                                                          self.evm_config.get("solana_slippage_bps", 500), http_session)
+                        if quote:
+                            swap_outcome = await execute_jupiter_swap(quote, _sol_keypair, _sol_client, http_session)
+                        else:
+                            swap_outcome = {"success": False, "error_message": "Failed to get Jupiter quote"}
+                    tx_hash = swap_outcome.get("signature")
+                    if swap_outcome.get("success"):
+                        status = "executed_onchain_solana_success"
+                        await self.log_message(f"Solana Trade SUCCESS (Tx {tx_id}): Sig {tx_hash}. In:{swap_outcome.get('input_amount_processed')} Out:{swap_outcome.get('output_amount_processed')}", "INFO")
+                        await self.log_message(f"Simulated portfolio NOT YET UPDATED for Solana trade input {tx['input_token']}.", "WARN")
+                    else:
+                        status = "failed_onchain_solana_execution"
+                        err_msg = swap_outcome.get('error_message', 'Unknown Solana swap error')
+                        await self.log_message(f"Solana Trade FAILED (Tx {tx_id}): {err_msg}. Sig(if any):{tx_hash}", "ERROR")
+
+                else:
+                    status, err_msg = "failed_unsupported_chain_type", f"Unsupported chain_type '{chain_type}'"
+                    await self.log_message(f"Tx {tx_id} {err_msg}", "ERROR")
+                self.multisig_wallet.mark_transaction_processed(tx_id, status, tx_hash=tx_hash, error_message=err_msg)
+            await self._settle_evm_trades(evm_in_flight)
+        finally:
+            if evm_executing:
+                self.multisig_wallet.mark_transaction_processed(
+                    evm_executing['id'], "submitted_unconfirmed",
+                    error_message="Batch aborted while the swap was being sent; check the wallet before retrying.")
+            # Aborted with swaps already broadcast: they have a hash, so they must never go back to "approved" and be resent
+            for tx_w, tx_hash, _ in evm_in_flight:
+                self.multisig_wallet.mark_transaction_processed(tx_w['id'], "submitted_unconfirmed", tx_hash=tx_hash)
+            try:
+                if evm_in_flight:
+                    # Receipt wait survives a further cancel of this task
+                    await asyncio.shield(self._settle_evm_trades(list(evm_in_flight)))
+            finally:
+                if _sol_client:
+                    await _sol_client.close()
+                    print("Closed active Solana client session.")
 
     # --- Other AgentGroup methods (generate_synopsis, export_discussion_log, etc.) ---
     # These methods are largely unchanged by this specific subtask, but would use the updated context.
     # For brevity, they are represented by the "..." from the previous step if no direct changes were specified for them here.
+    @staticmethod
+    def _synopsis_tx_line(tx_w:Dict)->str:
+        tx_info=tx_w['transaction']
+        return "".join((f"TxID {tx_w['id']}:{tx_info.get('action','N/A')} {tx_info.get('input_token','N/A')if tx_info.get('action')=='TRADE'else tx_info.get('crypto','N/A')}-Status:{tx_w['status']}.",
+                        f" (Hash:{tx_w['tx_hash'][:12]}...)"if tx_w.get('tx_hash')else"",f" (Error:{tx_w['error_message'][:50]}...)"if tx_w.get('error_message')else""))
+
     async def generate_synopsis(self):
-        prompt = f"Summarize key discussion points, decisions, and outcomes of any executed/failed on-chain transactions from Day {self.current_day}:\n\nDiscussion Highlights:\n"
-        max_interactions = self.evm_config.get("synopsis_max_interactions", 20); recent_interactions = self.discussion_log[-max_interactions:]
-        if recent_interactions: [prompt := prompt + f"- @{i['social_handle']} on '{i['topic'][:30]}...': {i['response'][:100].replace(chr(10),' ')}...\n" for i in recent_interactions]
-        else: prompt += "- No discussion points recorded.\n"
-        processed_txs = []
-        for tx_w in self.multisig_wallet.pending_transactions:
-            if tx_w['status'] not in ['pending','approved']:
-                tx_info,s=tx_w['transaction'],f"TxID {tx_w['id']}:{tx_info.get('action','N/A')} {tx_info.get('input_token','N/A')if tx_info.get('action')=='TRADE'else tx_info.get('crypto','N/A')}-Status:{tx_w['status']}."
-                if tx_w.get('tx_hash'):s+=f" (Hash:{tx_w['tx_hash'][:12]}...)"
-                if tx_w.get('error_message'):s+=f" (Error:{tx_w['error_message'][:50]}...)"
-                processed_txs.append(s)
-        if processed_txs:prompt+="\nTransaction Attempts Summary:\n"+"\n".join(processed_txs)
-        else:prompt+="\n- No on-chain transaction attempts processed today.\n"
-        try:self.synopsis=self.agents[0].model.generate_content(prompt).text
-        except Exception as e:self.synopsis=f"Error generating synopsis:{e}";print(f"Synopsis error:{e}")
+        parts = [f"Summarize key discussion points, decisions, and outcomes of any executed/failed on-chain transactions from Day {self.current_day}:\n\nDiscussion Highlights:\n"] # Joined once at the end
+        max_interactions = self.evm_config.get("synopsis_max_interactions", 20); recent_interactions = list(itertools.islice(self.discussion_log, max(0, len(self.discussion_log)-max_interactions), None))
+        if recent_interactions: parts.extend(f"- @{i['social_handle']} on '{i.get('topic_preview') or i['topic'][:30]}...': {i.get('response_preview') or i['response'][:100].replace(chr(10),' ')}...\n" for i in recent_interactions)
+        else: parts.append("- No discussion points recorded.\n")
+        wallet=self.multisig_wallet;wallet.clear_finalized_transactions();new=min(wallet.archived_total-self._synopsis_archive_mark,len(wallet.archive))
+        finalized=list(itertools.islice(wallet.archive,len(wallet.archive)-new,None));self._synopsis_archive_mark=wallet.archived_total # Next synopsis only reports txs finalized after this one
+        if finalized:parts.append("\nTransaction Attempts Summary:\n");parts.append("\n".join(map(self._synopsis_tx_line,finalized)))
+        else:parts.append("\n- No on-chain transaction attempts processed today.\n")
+        if not recent_interactions and not finalized:self.synopsis=f"Day {self.current_day}: no discussion or transaction activity recorded." # Nothing to summarize; skip the model call
+        else:
+            try:self.synopsis=await self.agents[0]._generate_async("".join(parts))
+            except Exception as e:self.synopsis=f"Error generating synopsis:{e}";print(f"Synopsis error:{e}")
         await self.log_message(f"\n--- Day {self.current_day} Synopsis ---\n{self.synopsis}\n--- End Synopsis ---","INFO");await self.broadcast({"type":"synopsis","content":self.synopsis})
 
+    async def _price_stream(self):
+        """Keeps `_live_prices` current from the Pyth Hermes WebSocket feed for the configured `pyth_price_ids`. Ticks don't dirty the context; see `_snapshot_prices`."""
+        ids_by_sym=self.evm_config.get("pyth_price_ids",{});sym_by_id={pid.lower().removeprefix("0x"):sym for sym,pid in ids_by_sym.items()}
+        url=self.evm_config.get("pyth_hermes_ws_url","wss://hermes.pyth.network/ws");prices=self._live_prices;backoff=1
+        while True:
+            try:
+                async with websockets.connect(url) as ws:
+                    await ws.send(_dumps({"type":"subscribe","ids":list(ids_by_sym.values())}));backoff=1
+                    await self.log_message(f"Subscribed to Pyth prices for {', '.join(ids_by_sym)}.","INFO")
+                    async for raw in ws:
+                        msg=orjson.loads(raw)
+                        if msg.get("type")!="price_update":continue
+                        feed=msg.get("price_feed",{});sym=sym_by_id.get(str(feed.get("id","")).lower().removeprefix("0x"));p=feed.get("price")
+                        if not sym or not p:continue
+                        price=int(p["price"])*10**int(p["expo"])
+                        if prices.get(sym,{}).get("usd")!=price:prices[sym]={"usd":price,"publish_time":p.get("publish_time")}
+            except asyncio.CancelledError:raise
+            except Exception as e:await self.log_message(f"Pyth price stream error: {e}. Reconnecting in {backoff}s.","WARN")
+            await asyncio.sleep(backoff);backoff=min(backoff*2,60)
+
+    def start_price_stream(self)->Optional[asyncio.Task]:
+        """Starts the background price stream if `pyth_price_ids` is configured."""
+        if not self.evm_config.get("pyth_price_ids"):return None
+        return asyncio.create_task(self._price_stream())
+
+    def _append_journal(self,entry:Dict):
+        try:
+            if self._journal is None:self._journal=open(self.discussion_journal_file,'a',encoding='utf-8')
+            self._journal.write(_dumps(entry)+"\n");self._journal.flush()
+        except Exception as e:print(f"Error writing discussion journal {self.discussion_journal_file}: {e}")
+
+    def save_state(self):
+        """Writes a snapshot of everything except discussion_log (which lives in the append-only journal). Atomic via os.replace."""
+        state={"current_day":self.current_day,"portfolio_holdings":self.portfolio.holdings,"simulated_fund_usd":self.simulated_fund_usd,
+               "pending_transactions":[{k:v for k,v in tx_w.items()if k!="_voted"}for tx_w in self.multisig_wallet.pending_transactions],"synopsis":self.synopsis,
+               "context":{k:v for k,v in self.context.items()if k not in _UNPERSISTED_CONTEXT_KEYS},
+               "analysis_cache":self.analysis_cache.to_dict()} # Unexpired API results, so a restart doesn't re-fetch them
+        tmp_fn=self.discussion_state_file+".tmp"
+        try:
+            with open(tmp_fn,'w',encoding='utf-8')as f:f.write(_dumps(state));f.flush();os.fsync(f.fileno()) # Data on disk before the rename
+            os.replace(tmp_fn,self.discussion_state_file)
+        except Exception as e:print(f"Error saving state to {self.discussion_state_file}: {e}")
+
+    def load_state(self)->bool:
+        """Restores the last snapshot, then rebuilds discussion_log by replaying the journal. Returns True if anything was restored."""
+        restored=False
+        try:
+            with open(self.discussion_state_file,'rb')as f:state=orjson.loads(f.read())
+            self.current_day=state.get("current_day",self.current_day);self.portfolio.holdings=state.get("portfolio_holdings",{});self.portfolio.version+=1
+            self.simulated_fund_usd=state.get("simulated_fund_usd",self.simulated_fund_usd);self.synopsis=state.get("synopsis","")
+            self.multisig_wallet.load_transactions(state.get("pending_transactions",[]));self.context.update((k,v)for k,v in state.get("context",{}).items()if k not in _UNPERSISTED_CONTEXT_KEYS) # Older snapshots may still hold them
+            self.analysis_cache.load(state.get("analysis_cache",{}));self._touch_analysis() # Trim a restored context to the cap
+            for tx_w in self.multisig_wallet.pending_transactions:tx_w.setdefault("tally",{k:sum(1 for v in tx_w["votes"]if v.get("verdict")==k)for k in("APPROVE","REJECT")})
+            self._sync_portfolio_context();self._touch_context();restored=True
+        except FileNotFoundError:pass
+        except Exception as e:print(f"Error loading state from {self.discussion_state_file}: {e}")
+        try:self.discussion_log.extend(self._iter_journal(self.discussion_log.maxlen));restored=restored or bool(self.discussion_log)
+        except FileNotFoundError:pass
+        if restored:print(f"Restored state: day {self.current_day}, {len(self.discussion_log)} logged interactions.")
+        return restored
+
+    def _iter_journal(self,tail:Optional[int]=None):
+        """Yields journal entries via mmap; with `tail`, only the last `tail` lines are found (scanning back from the end) and parsed."""
+        with open(self.discussion_journal_file,'rb')as f:
+            if os.fstat(f.fileno()).st_size==0:return # mmap rejects empty files
+            with mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)as mm:
+                if tail is not None:
+                    pos=len(mm)-1 if mm[-1:]==b"\n" else len(mm)
+                    for _ in range(tail):
+                        pos=mm.rfind(b"\n",0,pos)
+                        if pos<0:break
+                    mm.seek(pos+1)
+                for line in iter(mm.readline,b""):
+                    if not line.strip():continue
+                    try:yield orjson.loads(line)
+                    except orjson.JSONDecodeError:print(f"Skipping corrupt journal line in {self.discussion_journal_file}.") # e.g. torn last write
+
+    def close_journal(self):
+        if self._journal is not None:self._journal.close();self._journal=None
+
+    def close_trade_pool(self):self._trade_pool.shutdown(wait=False,cancel_futures=True)
+
+    def close_evm_connections(self):
+        self._w3_cache.clear();self._evm_wallet_cache.clear();evm_close_rpc_sessions()
+
     def export_discussion_log(self,fn="crypto_discussion_log_full.json"):
+        """Exports the full history from the journal; falls back to the in-memory window if there is no journal."""
         try:
-            with open(fn,'w')as f:json.dump(self.discussion_log,f,indent=2,default=str)
+            entries=list(self._iter_journal())if os.path.exists(self.discussion_journal_file)else list(self.discussion_log)
+            try:data=orjson.dumps(entries,default=str,option=orjson.OPT_INDENT_2|orjson.OPT_APPEND_NEWLINE)
+            except (orjson.JSONEncodeError,TypeError):data=json.dumps(entries,indent=2,default=str).encode()
+            with open(fn,'wb')as f:f.write(data)
             print(f"Full discussion log exported to {fn}")
         except Exception as e:print(f"Error exporting discussion log:{e}")
 
     def generate_seo_friendly_html(self,fn="crypto_discussion_log.html"):
         ws_port=self.evm_config.get("websocket_port",8765)
-        html=f"<!DOCTYPE html><html lang=en><head><meta charset=UTF-8><meta name=viewport content=\"width=device-width,initial-scale=1\"><title>AI Crypto Agents Log</title><style>body{{font-family:monospace;line-height:1.6;padding:20px;max-width:900px;margin:0 auto;background-color:#0a0a0a;color:#0f0}}h1,h2{{color:#0f0;border-bottom:1px solid #0c0;padding-bottom:5px}}#log,#terminal{{border:1px solid #0c0;padding:15px;margin-bottom:20px;border-radius:8px;height:400px;overflow-y:auto;background-color:#001a00;font-size:.9em}}#synopsis{{border:1px solid #0c0;padding:15px;margin-top:20px;background-color:#001a00;border-radius:8px}}.interaction{{margin-bottom:15px;padding-bottom:10px;border-bottom:1px dotted #030}}.timestamp{{color:#090;font-size:.8em}}.agent{{font-weight:700;color:#3c3}}.topic{{font-style:italic;color:#0a0;margin:5px 0}}#status{{color:#f33;font-weight:700;text-align:center;padding:10px;background-color:#1a0000;border-radius:5px;margin-bottom:10px}}pre{{white-space:pre-wrap;word-wrap:break-word;color:#cfc}}</style></head><body><h1>AI Crypto Agents Log</h1><div id=status>Connecting...</div><h2>System Terminal</h2><div id=terminal><p>Terminal init...</p></div><h2>Agent Discussion</h2><div id=log><p>Log init...</p></div><h2>Daily Synopsis</h2><div id=synopsis><p>Synopsis init...</p></div><script>const term=document.getElementById('terminal'),logDiv=document.getElementById('log'),synDiv=document.getElementById('synopsis'),statDiv=document.getElementById('status');let sock;function fmt(t){{if('string'!=typeof t)t=String(t);return t.replace(/</g,'&lt;').replace(/>/g,'&gt;').replace(/\\n/g,'<br>').replace(/    /g,'&nbsp;&nbsp;&nbsp;&nbsp;')}}function appTerm(t){{const e=document.createElement('p');e.innerHTML=fmt(t),term.appendChild(e),term.scrollTop=term.scrollHeight}}function appLog(t){{const e=document.createElement('div');e.classList.add('interaction'),e.innerHTML=`<p class=timestamp>${{new Date(t.timestamp).toLocaleString()}}</p><p class=agent>@${{t.social_handle}} (${{t.agent}})</p><p class=topic>Topic: ${{fmt(t.topic)}}</p><pre>${{fmt(t.response)}}</pre>`,logDiv.appendChild(e),logDiv.scrollTop=logDiv.scrollHeight}}function updSyn(t){{synDiv.innerHTML=`<h2>Daily Synopsis</h2><pre>${{fmt(t)}}</pre>`}}function connSock(){{const t=window.location.protocol==='https:'?'wss:':'ws:',e=document.domain||window.location.hostname||'localhost',o={ws_port};sock=new WebSocket(`${{t}}//${{e}}:${{o}}`),sock.onopen=function(t){{statDiv.textContent='Live feed connected.';statDiv.style.color='#3c3';statDiv.style.backgroundColor='#001a00';console.log('WS connected');appTerm('WS connected.')}},sock.onmessage=function(t){{try{{const e=JSON.parse(t.data);'interaction'===e.type?appLog(e.content):'synopsis'===e.type?updSyn(e.content):'message'===e.type&&appTerm(e.content)}}catch(e){{console.error('Error parsing JSON/UI update:',e,'Data:',t.data);appTerm(`Error processing message: ${{t.data}}`)}}}},sock.onclose=function(t){{statDiv.textContent='Live feed disconnected. Retrying in 5s...';statDiv.style.color='#f33';statDiv.style.backgroundColor='#1a0000';console.log('WS closed. Reconnecting...');appTerm('WS closed. Reconnecting...');setTimeout(connSock,5e3)}},sock.onerror=function(t){{console.error('WS error:',t);statDiv.textContent='WS conn error.';statDiv.style.color='#f33';appTerm(`WS error: ${{t.message||'Unknown'}}`)}}}}connSock();</script></body></html>"""
+        html,digest=_render_html_page(ws_port)
+        if self._html_digest is None and os.path.exists(fn): # First render in this process: compare against the page left by a previous run
+            try:
+                with open(fn,'rb')as f:self._html_digest=hashlib.blake2b(f.read(),digest_size=8).digest()
+            except OSError:pass
+        if digest==self._html_digest and os.path.exists(fn):return # Unchanged since the last render
         try:
             with open(fn,'w',encoding='utf-8')as f:f.write(html)
-            print(f"HTML log page generated: {fn}")
+            self._html_digest=digest;print(f"HTML log page generated: {fn}")
         except Exception as e:print(f"Error writing HTML file '{fn}': {e}")
 
     def push_to_social_networks(self):
         if not self.synopsis:print("No synopsis to push.");return
         for cfg in self.evm_config.get("social_media_platforms",[]):print(f"SIMULATING: Pushing synopsis to {cfg.get('name','N/A')}...")
+    async def log_interaction(self,agent:AIAgent,topic:str,response:str):
+        interaction={"timestamp":datetime.now().isoformat(),"agent":agent.name,"social_handle":agent.social_handle,"topic":topic,"response":response,"response_html":_to_html(response),
+                     "topic_preview":topic[:30],"response_preview":response[:100].replace("\n"," ")} # Previews feed the synopsis prompt
+        self.discussion_log.append(interaction);self._append_journal(interaction)
+        if self.websocket_clients:await self.broadcast({"type":"interaction","content":interaction}) # Headless runs skip payload construction entirely
+        self.push_to_api(interaction)
     async def register(self,ws):self.websocket_clients.add(ws);await self.log_message(f"Client {ws.remote_address} connected. Total:{len(self.websocket_clients)}",level="DEBUG")
     async def unregister(self,ws):self.websocket_clients.discard(ws);await self.log_message(f"Client {ws.remote_address} disconnected. Total:{len(self.websocket_clients)}",level="DEBUG")
     async def broadcast(self,msg:Dict):
-        if self.websocket_clients:
-            for c in list(self.websocket_clients):
-                try:await asyncio.wait_for(c.send(json.dumps(msg)),timeout=1.0)
-                except Exception:self.websocket_clients.discard(c)
+        """Encodes `msg` once and queues it on every open client via websockets.broadcast (no per-client task or await).
+        Closed connections are skipped here and removed by ws_handler's unregister."""
+        if not self.websocket_clients:return
+        websockets.broadcast(self.websocket_clients,_dumps(msg))
     def push_to_api(self,data:Dict):
-        ep=self.evm_config.get("external_api_endpoint")
-        if not ep:return
-        try:
-            r=requests.post(ep,json=data,timeout=self.evm_config.get("api_timeout_seconds",10))
-            if r.status_code<300:print(f"Pushed to {ep} for {data['agent']}. Status:{r.status_code}")
-            else:print(f"Failed push to {ep} for {data['agent']}. Status:{r.status_code}, Resp:{r.text[:100]}")
-        except Exception as e:print(f"Error pushing to {ep} for {data['agent']}: {e}")
+        """Queues `data` for the background API pusher without blocking; drops it if the queue is full."""
+        if not self.evm_config.get("external_api_endpoint"):return
+        if self._push_queue is None:
+            self._push_queue=asyncio.Queue(maxsize=1000)
+            self._push_workers=[asyncio.create_task(self._push_worker())for _ in range(max(1,self.evm_config.get("api_push_concurrency",4)))]
+        try:self._push_queue.put_nowait(data)
+        except asyncio.QueueFull:print(f"API push queue full; dropping interaction from {data.get('agent')}.")
+
+    def _get_http_session(self)->aiohttp.ClientSession:
+        if self._http_session is None or self._http_session.closed:
+            self._http_session=aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.evm_config.get("api_timeout_seconds",10)),
+                                                     connector=aiohttp.TCPConnector(limit=16,keepalive_timeout=30),json_serialize=_dumps) # orjson for json= bodies
+        return self._http_session
+
+    async def _push_worker(self):
+        """Posts queued interactions one per request, or with `api_push_batch_size` > 1 as `{"batch": [...]}` of up to that many,
+        flushing a partial batch after `api_push_flush_ms`."""
+        ep=self.evm_config.get("external_api_endpoint");session=self._get_http_session();loop=asyncio.get_running_loop()
+        batch_max=max(1,self.evm_config.get("api_push_batch_size",1));flush_s=self.evm_config.get("api_push_flush_ms",500)/1000
+        while True:
+            items=[await self._push_queue.get()];deadline=loop.time()+flush_s
+            while len(items)<batch_max:
+                if not self._push_queue.empty():items.append(self._push_queue.get_nowait());continue
+                try:items.append(await asyncio.wait_for(self._push_queue.get(),deadline-loop.time()))
+                except asyncio.TimeoutError:break
+            who=items[0]['agent']if batch_max==1 else f"{len(items)} interaction(s)"
+            try:
+                async with session.post(ep,json=items[0]if batch_max==1 else{"batch":items}) as r:
+                    if r.status==207:self._log_partial_push(ep,items,await r.text())
+                    elif r.status<300:print(f"Pushed to {ep} for {who}. Status:{r.status}")
+                    else:print(f"Failed push to {ep} for {who}. Status:{r.status}, Resp:{(await r.text())[:100]}")
+            except Exception as e:print(f"Error pushing to {ep} for {who}: {e}")
+            finally:
+                for _ in items:self._push_queue.task_done()
+
+    @staticmethod
+    def _log_partial_push(ep:str,items:List[Dict],body:str):
+        """Reports the failed items of a 207 Multi-Status reply, expected as `{"results": [{"status": ..., "error": ...}, ...]}` in batch order."""
+        try:results=orjson.loads(body).get("results")
+        except (orjson.JSONDecodeError,AttributeError):results=None
+        if not isinstance(results,list):print(f"Partial push to {ep} for {len(items)} interaction(s). Resp:{body[:100]}");return
+        failed=[(d,res)for d,res in zip(items,results)if isinstance(res,dict)and(res.get("error")or (res.get("status")or 200)>=300)]
+        print(f"Partial push to {ep}: {len(items)-len(failed)}/{len(items)} accepted.")
+        for d,res in failed:print(f"  Failed push for {d.get('agent')}: {res.get('status')} {res.get('error','')}")
+
+    async def close_api_pusher(self):
+        """Waits for queued API pushes to be sent, stops the background pushers and closes the shared HTTP session."""
+        if self._push_workers:
+            try:await asyncio.wait_for(self._push_queue.join(),timeout=self.evm_config.get("api_timeout_seconds",10)*2)
+            except asyncio.TimeoutError:print(f"API push drain timed out; dropping {self._push_queue.qsize()} queued item(s).")
+            for t in self._push_workers:t.cancel()
+            await asyncio.gather(*self._push_workers,return_exceptions=True)
+            self._push_queue=None;self._push_workers=[]
+        if self._http_session is not None and not self._http_session.closed:await self._http_session.close()
 
 async def start_websocket_server(ag_instance:AgentGroup):
     global websocket_server_running
-    async def ws_handler(ws,path):await ag_instance.register(ws);try:await ws.wait_closed()finally:await ag_instance.unregister(ws)
+    async def ws_handler(ws,path):
+        await ag_instance.register(ws)
+        try:await ws.wait_closed()
+        finally:await ag_instance.unregister(ws)
     if websocket_server_running:await ag_instance.log_message("WS server already running.","WARN");return
     websocket_server_running=True;host,port=ag_instance.evm_config.get("websocket_host","localhost"),ag_instance.evm_config.get("websocket_port",8765)
     try:server=await websockets.serve(ws_handler,host,port);await ag_instance.log_message(f"WS server on ws://{host}:{port}","INFO");await server.wait_closed()
     except Exception as e:await ag_instance.log_message(f"WS server error:{e}","CRITICAL")
     finally:websocket_server_running=False;await ag_instance.log_message("WS server shut down.","INFO")
 
-def run_http_server(html_path:str,ag_instance:AgentGroup):
+async def start_http_server(html_path:str,ag_instance:AgentGroup)->Optional[web.AppRunner]:
+    """Serves only the log page (from memory, with ETag) on the running loop; config, state and journal files next to it stay private. Returns the runner to clean up, or None."""
     global http_server_running
-    if http_server_running:print("HTTP server already running.");return
-    class Handler(http.server.SimpleHTTPRequestHandler):
-        def __init__(self,*a,**kw):super().__init__(*a,directory=os.path.dirname(os.path.abspath(html_path))or'.',**kw)
-        def do_GET(self):
-            if self.path=='/':self.path=os.path.basename(html_path)
-            super().do_GET()
+    if http_server_running:print("HTTP server already running.");return None
+    page={"body":b"","etag":"","mtime":None,"checked":0.0} # Log page served from memory; re-read when its mtime changes
+    def current_page():
+        now=time.monotonic()
+        if now-page["checked"]>=1.0: # At most one stat per second
+            page["checked"]=now;mtime=os.stat(html_path).st_mtime_ns
+            if mtime!=page["mtime"]:
+                with open(html_path,'rb')as f:page["body"]=f.read()
+                page["etag"]='"'+hashlib.blake2b(page["body"],digest_size=16).hexdigest()+'"';page["mtime"]=mtime
+        return page["body"],page["etag"]
+    async def serve_page(request:web.Request)->web.Response:
+        try:body,etag=current_page()
+        except OSError:raise web.HTTPNotFound(text="Log page not generated yet")
+        if request.headers.get("If-None-Match")==etag:return web.Response(status=304,headers={"ETag":etag})
+        return web.Response(body=body,content_type="text/html",charset="utf-8",headers={"ETag":etag})
+    app=web.Application();app.router.add_get('/',serve_page);app.router.add_get('/'+os.path.basename(html_path),serve_page)
+    runner=web.AppRunner(app);await runner.setup()
     host,port=ag_instance.evm_config.get("http_host","localhost"),ag_instance.evm_config.get("http_port",8000)
+    reuse_port=bool(ag_instance.evm_config.get("http_reuse_port",False)) # SO_REUSEPORT also lets several processes share the port, so it is opt-in
     for attempt in range(3):
         curr_port=port+attempt
         try:
-            with socketserver.TCPServer((host,curr_port),Handler)as httpd:http_server_running=True;print(f"HTTP server: http://{host}:{curr_port}/{os.path.basename(html_path)}");httpd.serve_forever();break
+            await web.TCPSite(runner,host,curr_port,reuse_port=reuse_port or None).start()
+            http_server_running=True;print(f"HTTP server: http://{host}:{curr_port}/{os.path.basename(html_path)}");return runner
         except OSError as e:
             if e.errno in[98,10048]:print(f"HTTP Port {curr_port} in use. Trying next...")
             else:print(f"HTTP server OSError:{e}");break
         except Exception as e:print(f"HTTP server error:{e}");break
-    if not http_server_running:print("HTTP server failed to start.")
-    http_server_running=False
+    print("HTTP server failed to start.");await runner.cleanup();return None
+
+_SHUTDOWN_HOOKS:List[Callable[[],Awaitable[Any]]]=[] # Async teardown callbacks, run concurrently by _run_shutdown_hooks
+
+async def _cancel_and_wait(task:Optional[asyncio.Task]):
+    if task is None or task.done():return
+    task.cancel()
+    try:await task
+    except asyncio.CancelledError:pass
+
+async def _run_shutdown_hooks(timeout:float=30.0):
+    """Runs (and clears) the registered shutdown hooks concurrently; a failing hook is reported without stopping the others.
+    Hooks still running after `timeout` seconds are reported and cancelled so exit stays bounded."""
+    hooks=_SHUTDOWN_HOOKS[:];_SHUTDOWN_HOOKS.clear()
+    if not hooks:return
+    tasks={asyncio.create_task(h()):h for h in hooks}
+    done,pending=await asyncio.wait(tasks,timeout=timeout)
+    for t in done:
+        if not t.cancelled()and t.exception():print(f"Shutdown hook {getattr(tasks[t],'__name__',repr(tasks[t]))} failed: {type(t.exception()).__name__} - {t.exception()}")
+    if pending:
+        print(f"Shutdown timed out after {timeout}s; cancelling: {', '.join(getattr(tasks[t],'__name__',repr(tasks[t]))for t in pending)}")
+        for t in pending:t.cancel()
+        await asyncio.gather(*pending,return_exceptions=True)
 
 async def main():
     gemini_key=os.getenv("GEMINI_API_KEY");
-    if not gemini_key:print("CRITICAL: GEMINI_API_KEY env var not set.");return
+    if not gemini_key:print("CRITICAL: GEMINI_API_KEY env var not set.");return 1
     agent_defs=[{"name":"AlphaSeeker","role":"Identifies trends & proposes trades. Must use ANALYSIS_TOKEN first.","social_handle":"AlphaSeekerBot"},
                   {"name":"RiskGuard","role":"Analyzes trade risks & token safety. Votes diligently.","social_handle":"RiskGuardBot"},
                   {"name":"PortfolioOptimus","role":"Develops strategies, suggests rebalancing trades. Checks analysis.","social_handle":"PortfolioOptBot"}]
     try:btc_p=float(os.getenv("MOCK_BTC_PRICE_USD","60000"));usd_v=float(os.getenv("MOCK_INITIAL_USD_FUND","1000"));init_btc=usd_v/btc_p if btc_p>0 else .0001
     except Exception as e:print(f"Warn:Sim funding error({e}).Defaulting.");init_btc=.0001
     ag=AgentGroup(agent_defs,initial_simulated_btc_amount=init_btc)
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(1,ag.evm_config.get("thread_pool_size",64)),thread_name_prefix="agent-io")) # asyncio.to_thread pool: I/O-bound, so wider than the cpu+4 default
+    ag.load_state()
     html_fn="crypto_discussion_log.html";ag.generate_seo_friendly_html(html_fn)
     await ag.log_message("Init AI Agent Group & services...","INFO")
-    ws_task=asyncio.create_task(start_websocket_server(ag))
-    http_thread=threading.Thread(target=run_http_server,args=(html_fn,ag),daemon=True);http_thread.start()
-    await asyncio.sleep(1)
-    if not websocket_server_running:await ag.log_message("WS server failed. Live HTML impaired.","CRITICAL")
-    n_days=ag.evm_config.get("discussion_simulation_days",1);await ag.autonomous_discussion(num_simulation_days=n_days)
-    await ag.log_message("Discussion complete. Shutting down...","INFO")
-    if ws_task and not ws_task.done():
-        ws_task.cancel();
-        try:await ws_task
-        except asyncio.CancelledError:await ag.log_message("WS server task cancelled.","INFO")
-        except Exception as e:await ag.log_message(f"Error during WS shutdown:{e}","ERROR")
-    ag.export_discussion_log();await ag.log_message("Script finished.","INFO")
+    ws_task=asyncio.create_task(start_websocket_server(ag));price_task=ag.start_price_stream()
+    _SHUTDOWN_HOOKS.extend([ag.close_api_pusher,functools.partial(_cancel_and_wait,price_task),functools.partial(_cancel_and_wait,ws_task)])
+    http_runner=await start_http_server(html_fn,ag) # Same loop as the WS server; no serving thread
+    if http_runner:_SHUTDOWN_HOOKS.append(http_runner.cleanup)
+    try:
+        await asyncio.sleep(1)
+        if not websocket_server_running:await ag.log_message("WS server failed. Live HTML impaired.","CRITICAL")
+        n_days=ag.evm_config.get("discussion_simulation_days",1);discussion=asyncio.create_task(ag.autonomous_discussion(num_simulation_days=n_days))
+        stop=asyncio.create_task(_shutdown_event.wait()) if _shutdown_event is not None else None
+        await asyncio.wait({t for t in(discussion,stop)if t},return_when=asyncio.FIRST_COMPLETED)
+        if stop:stop.cancel()
+        if not discussion.done():discussion.cancel();await ag.log_message("Shutdown requested; stopping discussion.","WARN")
+        try:await discussion
+        except asyncio.CancelledError:pass
+        await ag.log_message("Discussion complete. Shutting down...","INFO")
+    finally:await _run_shutdown_hooks(ag.evm_config.get("shutdown_timeout_seconds",30)) # API drain, price stream and WS server stop together
+    ag.save_state();ag.close_journal();ag.close_trade_pool();ag.close_evm_connections();ag.export_discussion_log();await ag.log_message("Script finished.","INFO")
 
-if __name__=="__main__":
-    try:asyncio.run(main())
-    except KeyboardInterrupt:print("\nApp interrupted. Shutting down...")
-    except Exception as e:print(f"CRITICAL ERROR in __main__:{type(e).__name__}-{e}");import traceback;traceback.print_exc()
-    finally:print("App exit.")
-```
+_shutdown_event:Optional[asyncio.Event]=None # Set by SIGINT/SIGTERM; main() then winds down through its normal shutdown path
+
+def _request_shutdown(sig:signal.Signals,main_task:asyncio.Task):
+    """First signal starts a graceful shutdown; a repeated one cancels main() outright."""
+    if _shutdown_event is not None and not _shutdown_event.is_set():print(f"\nReceived {sig.name}. Shutting down... (repeat to force)");_shutdown_event.set()
+    elif not main_task.done():print(f"\nReceived {sig.name} again. Forcing shutdown.");main_task.cancel()
 
-[end of ai_agent.py]
+if __name__=="__main__":
+    sys.excepthook=lambda et,ev,tb:log.critical("Uncaught %s: %s",et.__name__,ev,exc_info=(et,ev,tb))
+    threading.excepthook=lambda a:log.critical("Uncaught %s in thread %s: %s",a.exc_type.__name__,a.thread.name if a.thread else "?",a.exc_value,exc_info=(a.exc_type,a.exc_value,a.exc_traceback))
+    exit_code=0 # 1 = crashed or failed to start, 130 = interrupted before a clean finish (SIGINT convention)
+    try:import uvloop;loop=uvloop.new_event_loop() # Optional libuv-based loop; same API as asyncio's default
+    except ImportError:loop=asyncio.new_event_loop()
+    asyncio.set_event_loop(loop);_shutdown_event=asyncio.Event()
+    main_task=loop.create_task(main())
+    for sig in(signal.SIGINT,signal.SIGTERM):
+        try:loop.add_signal_handler(sig,_request_shutdown,sig,main_task)
+        except NotImplementedError: # Windows event loops have no add_signal_handler; hop onto the loop from a plain handler
+            signal.signal(sig,lambda signum,frame:loop.call_soon_threadsafe(_request_shutdown,signal.Signals(signum),main_task))
+    try:exit_code=loop.run_until_complete(main_task)or 0
+    except asyncio.CancelledError:print("Shutdown forced before cleanup finished.");exit_code=130
+    except KeyboardInterrupt:print("\nApp interrupted. Shutting down...");exit_code=130
+    except Exception as e:log.critical("Unhandled error in __main__: %s - %s",type(e).__name__,e,exc_info=True);exit_code=1 # One record incl. traceback
+    finally:
+        pending=[t for t in asyncio.all_tasks(loop)if not t.done()] # e.g. tasks main() never reached, or left behind by an error
+        for t in pending:t.cancel()
+        if pending:loop.run_until_complete(asyncio.gather(*pending,return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens());loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close();print(f"App exit ({exit_code}).")
+    sys.exit(exit_code)
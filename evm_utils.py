@@ -38,10 +38,14 @@ IMPORTANT SECURITY CONSIDERATIONS:
     responsible for any financial losses or other damages you may incur through
     the use of this software. Use this software entirely at your own risk.
 """
+import functools
 import json
 import os
+import threading
 import time
+import requests
 from web3 import Web3
+from web3.exceptions import TransactionNotFound
 from datetime import datetime
 
 # Minimal ABI for ERC20 token interactions (balanceOf, decimals, approve, allowance)
@@ -59,6 +63,87 @@ UNISWAP_V2_ROUTER_ABI = [
     {"inputs":[{"internalType":"uint256","name":"amountIn","type":"uint256"},{"internalType":"address[]","name":"path","type":"address[]"}],"name":"getAmountsOut","outputs":[{"internalType":"uint256[]","name":"amounts","type":"uint256[]"}],"stateMutability":"view","type":"function"}
 ]
 
+# Multicall3 is deployed at the same address on most EVM chains (https://www.multicall3.com/deployments).
+# Override per network with the optional `multicall3_addresses` config entry.
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ABI = [
+    {"inputs":[{"components":[{"internalType":"address","name":"target","type":"address"},{"internalType":"bool","name":"allowFailure","type":"bool"},{"internalType":"bytes","name":"callData","type":"bytes"}],"internalType":"struct Multicall3.Call3[]","name":"calls","type":"tuple[]"}],"name":"aggregate3","outputs":[{"components":[{"internalType":"bool","name":"success","type":"bool"},{"internalType":"bytes","name":"returnData","type":"bytes"}],"internalType":"struct Multicall3.Result[]","name":"returnData","type":"tuple[]"}],"stateMutability":"payable","type":"function"},
+    {"inputs":[{"internalType":"address","name":"addr","type":"address"}],"name":"getEthBalance","outputs":[{"internalType":"uint256","name":"balance","type":"uint256"}],"stateMutability":"view","type":"function"}
+]
+
+_CONTRACT_ABIS = {"erc20": MINIMAL_ERC20_ABI, "uniswap_v2_router": UNISWAP_V2_ROUTER_ABI, "multicall3": MULTICALL3_ABI}
+
+_RPC_SESSIONS = {} # rpc_url -> requests.Session, shared by the Web3 provider and raw JSON-RPC batches
+
+def _get_rpc_session(rpc_url):
+    session = _RPC_SESSIONS.get(rpc_url)
+    if session is None: session = _RPC_SESSIONS[rpc_url] = requests.Session()
+    return session
+
+def close_rpc_sessions():
+    """Closes the pooled HTTP sessions behind every Web3 instance created by connect_to_network."""
+    _get_contract.cache_clear() # Drops contract objects bound to those Web3 instances
+    while _RPC_SESSIONS:
+        _, session = _RPC_SESSIONS.popitem()
+        session.close()
+
+def _rpc_batch(web3_instance, calls, timeout=30):
+    """
+    Sends [(method, params), ...] as a single JSON-RPC batch over the instance's HTTP endpoint.
+    Hand-rolled because web3 v6 (pinned in requirements.txt) has no `batch_requests`.
+    Returns the raw results in call order; raises if batching is unsupported or any call errored.
+    """
+    endpoint = getattr(web3_instance.provider, 'endpoint_uri', None)
+    if not endpoint: raise ValueError("JSON-RPC batching requires an HTTP provider")
+    payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params} for i, (method, params) in enumerate(calls)]
+    response = _get_rpc_session(str(endpoint)).post(str(endpoint), json=payload, timeout=timeout)
+    response.raise_for_status()
+    replies = response.json()
+    if not isinstance(replies, list): raise ValueError(f"RPC endpoint does not support batch requests: {replies}")
+    by_id = {reply.get("id"): reply for reply in replies}
+    results = []
+    for i in range(len(calls)):
+        reply = by_id.get(i)
+        if reply is None or "error" in reply: raise ValueError(f"Batched call {calls[i][0]} failed: {reply and reply.get('error')}")
+        results.append(reply["result"])
+    return results
+
+class NonceTracker:
+    """
+    Hands out sequential nonces for one wallet on one network. Seeded once from the 'pending' count, then
+    incremented locally per signed tx, so back-to-back sends don't depend on the RPC node's mempool view.
+    """
+    def __init__(self, web3_instance, address):
+        self._web3, self._address = web3_instance, address
+        self._next = None
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Returns the nonce for the next signed tx."""
+        with self._lock:
+            if self._next is None: self._next = self._web3.eth.get_transaction_count(self._address, 'pending')
+            nonce, self._next = self._next, self._next + 1
+            return nonce
+
+    def release(self, nonce):
+        """Gives back a nonce whose tx was never broadcast; re-seeds from the node if it wasn't the latest."""
+        with self._lock:
+            self._next = nonce if self._next == nonce + 1 else None
+
+def _take_nonce(web3_instance, address, nonce):
+    """Resolves a `nonce` argument: an int is used as-is, a NonceTracker hands out its next nonce, None reads 'pending'."""
+    if isinstance(nonce, NonceTracker): return nonce.take()
+    if nonce is not None: return nonce
+    return web3_instance.eth.get_transaction_count(address, 'pending') # Count txs still in the mempool
+
+def _release_nonce(nonce, value):
+    if isinstance(nonce, NonceTracker) and value is not None: nonce.release(value)
+
+@functools.lru_cache(maxsize=64)
+def _get_contract(web3_instance, address, abi_name):
+    """Returns a contract object for a checksummed `address`, built once per (Web3 instance, address, ABI)."""
+    return web3_instance.eth.contract(address=address, abi=_CONTRACT_ABIS[abi_name])
+
 def load_config(config_path='config.json'):
     """
     Loads configuration settings from a JSON file.
@@ -85,18 +170,19 @@ def load_config(config_path='config.json'):
         return None
 
 
-def connect_to_network(network_name, config_path='config.json'):
+def connect_to_network(network_name, config_path='config.json', config=None):
     """
     Connects to an EVM network using settings from the configuration file.
 
     Args:
         network_name (str): The key for the network in the config (e.g., "sepolia").
         config_path (str): Path to the configuration file.
+        config (dict, optional): Already-loaded configuration; when given, config_path is not read.
 
     Returns:
         Web3 or None: A Web3 instance connected to the network, or None if connection fails.
     """
-    config = load_config(config_path)
+    config = config if config is not None else load_config(config_path)
     if not config:
         return None
 
@@ -114,7 +200,7 @@ def connect_to_network(network_name, config_path='config.json'):
     expected_chain_id = chain_ids[network_name]
 
     try:
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
+        w3 = Web3(Web3.HTTPProvider(rpc_url, session=_get_rpc_session(rpc_url))) # Keep-alive session per RPC URL
         if w3.is_connected():
             current_chain_id = w3.eth.chain_id
             if current_chain_id == expected_chain_id:
@@ -130,7 +216,7 @@ def connect_to_network(network_name, config_path='config.json'):
         print(f"Error connecting to network '{network_name}': {type(e).__name__} - {e}")
         return None
 
-def load_wallet(web3_instance, network_name, config_path='config.json'):
+def load_wallet(web3_instance, network_name, config_path='config.json', config=None):
     """
     Loads a wallet account from a private key, typically stored in the configuration file.
     Includes prominent warnings about private key security.
@@ -139,6 +225,7 @@ def load_wallet(web3_instance, network_name, config_path='config.json'):
         web3_instance (Web3): Active Web3 instance.
         network_name (str): Name of the network (for logging purposes).
         config_path (str): Path to the configuration file.
+        config (dict, optional): Already-loaded configuration; when given, config_path is not read.
 
     Returns:
         LocalAccount or None: The loaded wallet account object, or None if loading fails.
@@ -158,7 +245,7 @@ def load_wallet(web3_instance, network_name, config_path='config.json'):
         print("Error: Web3 instance is not available. Cannot load wallet.")
         return None
 
-    config = load_config(config_path)
+    config = config if config is not None else load_config(config_path)
     if not config:
         print("Error: Configuration not loaded. Cannot retrieve private key to load wallet.")
         return None
@@ -192,7 +279,8 @@ def load_wallet(web3_instance, network_name, config_path='config.json'):
         return None
 
 
-def get_token_balance(web3_instance, wallet_address, token_symbol, network_name, config_path='config.json'):
+def get_token_balance(web3_instance, wallet_address, token_symbol, network_name, config_path='config.json', config=None,
+                      token_snapshot=None):
     """
     Gets the balance of a specified token (native or ERC20) for a given wallet address.
 
@@ -202,10 +290,17 @@ def get_token_balance(web3_instance, wallet_address, token_symbol, network_name,
         token_symbol (str): The symbol of the token (e.g., "ETH", "MATIC", "USDC").
         network_name (str): The network key from the config.
         config_path (str): Path to the configuration file.
+        config (dict, optional): Already-loaded configuration; when given, config_path is not read.
+        token_snapshot (dict, optional): Pre-fetched state from `get_erc20_snapshot` for this wallet. When it
+                                         holds the token's balance and decimals, no RPC call is made.
 
     Returns:
         Decimal or None: The token balance (adjusted for decimals), or None if an error occurs.
     """
+    cached = (token_snapshot or {}).get(token_symbol) or {}
+    if cached.get("balance") is not None and cached.get("decimals") is not None:
+        if cached["address"] is None: return Web3.from_wei(cached["balance"], 'ether')
+        return cached["balance"] / (10**cached["decimals"])
     if not web3_instance:
         print("Error (get_token_balance): Web3 instance is not available.")
         return None
@@ -213,7 +308,7 @@ def get_token_balance(web3_instance, wallet_address, token_symbol, network_name,
         print("Error (get_token_balance): Wallet address is not provided.")
         return None
 
-    config = load_config(config_path)
+    config = config if config is not None else load_config(config_path)
     if not config: return None
 
     token_info_for_network = config.get('token_addresses', {}).get(network_name, {})
@@ -243,7 +338,7 @@ def get_token_balance(web3_instance, wallet_address, token_symbol, network_name,
 
     try:
         token_address = Web3.to_checksum_address(token_address_str)
-        token_contract = web3_instance.eth.contract(address=token_address, abi=MINIMAL_ERC20_ABI)
+        token_contract = _get_contract(web3_instance, token_address, "erc20")
 
         balance_raw = token_contract.functions.balanceOf(checksum_wallet_address).call()
         decimals = token_contract.functions.decimals().call()
@@ -259,8 +354,94 @@ def get_token_balance(web3_instance, wallet_address, token_symbol, network_name,
         return None
 
 
+def get_erc20_snapshot(web3_instance, wallet_address, network_name, token_symbols,
+                       spender_addresses=(), config_path='config.json', config=None):
+    """
+    Reads decimals, balance and allowances for several ERC20 tokens in a single round-trip.
+
+    All `decimals()`, `balanceOf(wallet)` and `allowance(wallet, spender)` calls are
+    bundled into one Multicall3 `aggregate3` call, together with the native-currency
+    balance (via Multicall3 `getEthBalance`) when the native symbol is requested. If
+    Multicall3 is not deployed on the network (or the call fails), it falls back to
+    reading each value individually. Symbols missing from the config are skipped.
+
+    Args:
+        web3_instance (Web3): Active Web3 instance.
+        wallet_address (str): The wallet whose balances/allowances are read.
+        network_name (str): The network key from the config.
+        token_symbols (iterable of str): Token symbols to read (as keyed in `token_addresses`).
+        spender_addresses (iterable of str): Spenders (e.g. DEX routers) to read allowances for.
+        config_path (str): Path to the configuration file.
+        config (dict, optional): Already-loaded configuration; when given, config_path is not read.
+
+    Returns:
+        dict: {token_symbol: {"address", "decimals", "balance", "allowances": {spender: raw}}}.
+              The native entry has address None, decimals 18 and no allowances.
+              Values that could not be read are None. Empty dict on setup errors.
+    """
+    if not web3_instance or not wallet_address: return {}
+    config = config if config is not None else load_config(config_path)
+    if not config: return {}
+
+    token_info_net = config.get('token_addresses', {}).get(network_name, {})
+    native_sym = token_info_net.get("NATIVE", "ETH").upper()
+    try:
+        wallet = Web3.to_checksum_address(wallet_address)
+        spenders = [Web3.to_checksum_address(sp) for sp in dict.fromkeys(spender_addresses)]
+    except ValueError as ve:
+        print(f"Error (get_erc20_snapshot): Invalid wallet/spender address: {ve}")
+        return {}
+
+    multicall_address = config.get('multicall3_addresses', {}).get(network_name, MULTICALL3_ADDRESS)
+    try: multicall = _get_contract(web3_instance, Web3.to_checksum_address(multicall_address), "multicall3")
+    except ValueError: multicall = None
+
+    snapshot, reads = {}, [] # reads: (symbol, field, spender_or_None, contract_function)
+    for symbol in dict.fromkeys(token_symbols):
+        address_str = token_info_net.get(symbol)
+        if symbol.upper() == native_sym:
+            snapshot[symbol] = {"address": None, "decimals": 18, "balance": None, "allowances": {}}
+            if multicall is not None: reads.append((symbol, "balance", None, multicall.functions.getEthBalance(wallet)))
+            continue
+        if not address_str: continue
+        try: token_address = Web3.to_checksum_address(address_str)
+        except ValueError: print(f"Warning (get_erc20_snapshot): Invalid address for {symbol}: {address_str}"); continue
+        token_contract = _get_contract(web3_instance, token_address, "erc20")
+        snapshot[symbol] = {"address": token_address, "decimals": None, "balance": None, "allowances": {sp: None for sp in spenders}}
+        reads.append((symbol, "decimals", None, token_contract.functions.decimals()))
+        reads.append((symbol, "balance", None, token_contract.functions.balanceOf(wallet)))
+        reads.extend((symbol, "allowances", sp, token_contract.functions.allowance(wallet, sp)) for sp in spenders)
+    def _store(symbol, field, spender, value):
+        if spender is None: snapshot[symbol][field] = value
+        else: snapshot[symbol][field][spender] = value
+
+    def _read_native():
+        for symbol, entry in snapshot.items():
+            if entry["address"] is None and entry["balance"] is None:
+                try: entry["balance"] = web3_instance.eth.get_balance(wallet)
+                except Exception as e: print(f"Warning (get_erc20_snapshot): Could not read native balance for {symbol}: {e}")
+
+    if not reads: _read_native(); return snapshot
+    try:
+        calls = [(fn.address, True, fn._encode_transaction_data()) for _, _, _, fn in reads]
+        results = multicall.functions.aggregate3(calls).call()
+        for (symbol, field, spender, _), (ok, data) in zip(reads, results):
+            if ok and data: _store(symbol, field, spender, web3_instance.codec.decode(['uint256'], data)[0])
+        _read_native() # Only if getEthBalance itself failed
+        return snapshot
+    except Exception as e:
+        print(f"Info (get_erc20_snapshot): Multicall3 unavailable on {network_name} ({type(e).__name__}); reading tokens individually.")
+
+    for symbol, field, spender, fn in reads:
+        if snapshot[symbol]["address"] is None: continue # Native balance is read directly below, not through Multicall3
+        try: _store(symbol, field, spender, fn.call())
+        except Exception as e: print(f"Warning (get_erc20_snapshot): Could not read {field} for {symbol}: {e}")
+    _read_native()
+    return snapshot
+
+
 def approve_token(web3_instance, wallet_account, token_symbol, spender_address, network_name,
-                  amount_to_approve=None, config_path='config.json'):
+                  amount_to_approve=None, config_path='config.json', token_snapshot=None, config=None, nonce=None):
     """
     Approves a spender to spend a specified amount of an ERC20 token on behalf of the wallet owner.
 
@@ -273,6 +454,11 @@ def approve_token(web3_instance, wallet_account, token_symbol, spender_address,
         amount_to_approve (float, optional): The amount of the token to approve (in standard units, not wei).
                                              If None, approves the maximum possible amount (effectively infinite).
         config_path (str): Path to the configuration file.
+        config (dict, optional): Already-loaded configuration; when given, config_path is not read.
+        token_snapshot (dict, optional): Pre-fetched state from `get_erc20_snapshot`. Cached decimals and
+                                         allowance are used instead of live reads and updated after approval.
+        nonce (int or NonceTracker, optional): Nonce for the approval tx. A NonceTracker is only drawn from
+                                               when a tx is actually signed. Defaults to the 'pending' count.
 
     Returns:
         tuple (bool, str or None): (True, transaction_hash) if successful or allowance already sufficient.
@@ -282,7 +468,7 @@ def approve_token(web3_instance, wallet_account, token_symbol, spender_address,
         print("Error (approve_token): Web3 instance or wallet account is not available.")
         return False, "Web3 instance or wallet account missing."
 
-    config = load_config(config_path)
+    config = config if config is not None else load_config(config_path)
     if not config: return False, "Configuration not loaded for approve_token."
 
     token_addresses_on_network = config.get('token_addresses', {}).get(network_name, {})
@@ -306,11 +492,16 @@ def approve_token(web3_instance, wallet_account, token_symbol, spender_address,
     except ValueError as ve:
         return False, f"Invalid address format for token or spender: {ve}"
 
+    cached = (token_snapshot or {}).get(token_symbol) or {}
+    tx_nonce = None
     try:
-        token_contract = web3_instance.eth.contract(address=token_address, abi=MINIMAL_ERC20_ABI)
-        decimals = token_contract.functions.decimals().call()
+        token_contract = _get_contract(web3_instance, token_address, "erc20")
+        decimals = cached.get("decimals")
+        if decimals is None: decimals = token_contract.functions.decimals().call()
 
-        current_allowance_raw = token_contract.functions.allowance(wallet_account.address, spender_checksum_address).call()
+        current_allowance_raw = cached.get("allowances", {}).get(spender_checksum_address)
+        if current_allowance_raw is None:
+            current_allowance_raw = token_contract.functions.allowance(wallet_account.address, spender_checksum_address).call()
 
         amount_raw_to_approve = 2**256 - 1 # Default to max approval
         display_amount = "maximum (infinite)"
@@ -323,9 +514,10 @@ def approve_token(web3_instance, wallet_account, token_symbol, spender_address,
 
         print(f"Attempting to approve {display_amount} (raw: {amount_raw_to_approve}) for spender {spender_checksum_address} to spend {token_symbol} on {network_name}...")
 
+        tx_nonce = _take_nonce(web3_instance, wallet_account.address, nonce)
         tx_params = {
             'from': wallet_account.address,
-            'nonce': web3_instance.eth.get_transaction_count(wallet_account.address),
+            'nonce': tx_nonce,
             'gasPrice': web3_instance.eth.gas_price,
             'chainId': chain_id
         }
@@ -341,6 +533,7 @@ def approve_token(web3_instance, wallet_account, token_symbol, spender_address,
 
         signed_tx = web3_instance.eth.account.sign_transaction(unsigned_approve_tx, wallet_account.key)
         tx_hash_bytes = web3_instance.eth.send_raw_transaction(signed_tx.rawTransaction)
+        tx_nonce = None # Broadcast: the nonce is spent whatever the receipt says
         tx_hash = Web3.to_hex(tx_hash_bytes)
         print(f"Approval transaction sent. Hash: {tx_hash}")
 
@@ -349,18 +542,21 @@ def approve_token(web3_instance, wallet_account, token_symbol, spender_address,
 
         if tx_receipt.status == 1:
             print(f"Approval successful for {token_symbol}. Tx: {tx_hash}")
+            if cached: cached.setdefault("allowances", {})[spender_checksum_address] = amount_raw_to_approve
             return True, tx_hash
         else:
             print(f"Approval transaction failed on-chain for {token_symbol}. Tx: {tx_hash}. Receipt: {tx_receipt}")
             return False, tx_hash
     except Exception as e:
+        _release_nonce(nonce, tx_nonce)
         print(f"Error during token approval for {token_symbol}: {type(e).__name__} - {e}")
         return False, f"Exception during approval: {e}"
 
 
 def execute_trade(web3_instance, wallet_account, network_name, dex_name,
                   input_token_symbol, output_token_symbol, amount_in,
-                  config_path='config.json', slippage_tolerance=0.01):
+                  config_path='config.json', slippage_tolerance=0.01, token_snapshot=None, wait_for_receipt=True,
+                  config=None, nonce=None):
     """
     Executes a trade on a DEX, handling native-to-ERC20, ERC20-to-native, and ERC20-to-ERC20 swaps.
     Includes pre-trade summary and attempts token approval if needed for ERC20 input.
@@ -374,7 +570,18 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
         output_token_symbol (str): Symbol of the token to buy.
         amount_in (float): Amount of the input_token to sell (in standard units).
         config_path (str): Path to the configuration file.
+        config (dict, optional): Already-loaded configuration; when given, config_path is not read.
         slippage_tolerance (float): Allowed slippage (e.g., 0.01 for 1%).
+        token_snapshot (dict, optional): Pre-fetched state from `get_erc20_snapshot` for this wallet and
+                                         network. Avoids per-trade decimals/balance/allowance reads.
+        wait_for_receipt (bool): If False, return right after the swap is broadcast (success means "submitted")
+                                 so several trades can be in flight; confirm them with `wait_for_trade_receipt`.
+        nonce (int or NonceTracker, optional): Nonce source for this wallet. Pass one NonceTracker per
+                                               (network, wallet) when sending several trades back to back.
+
+    Ordering: an approval the swap needs is sent first and awaited inline, even when wait_for_receipt is
+    False, and the swap is signed with the next nonce after it. Both come from the same `nonce` source, so
+    the approval is always mined before the swap and no nonce is skipped or reused.
 
     Returns:
         tuple (str or None, bool, str): (transaction_hash, success_status, message)
@@ -384,7 +591,7 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
     if not web3_instance or not wallet_account:
         return tx_hash_str, False, "Web3 instance or wallet account missing for execute_trade."
 
-    config = load_config(config_path)
+    config = config if config is not None else load_config(config_path)
     if not config: return tx_hash_str, False, "Configuration not loaded for execute_trade."
 
     # --- Configuration Validation ---
@@ -393,7 +600,8 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
 
     dex_router_address_str = config.get('dex_routers', {}).get(network_name, {}).get(dex_name)
     if not dex_router_address_str: return tx_hash_str, False, f"DEX router '{dex_name}' not found for network '{network_name}'."
-    dex_router_address = Web3.to_checksum_address(dex_router_address_str)
+    try: dex_router_address = Web3.to_checksum_address(dex_router_address_str)
+    except ValueError as ve: return tx_hash_str, False, f"Invalid DEX router address for '{dex_name}': {ve}"
 
     token_info_net = config.get('token_addresses', {}).get(network_name, {})
     native_sym = token_info_net.get("NATIVE", "ETH")
@@ -417,20 +625,25 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
     input_decimals = 18 # Default for native
     input_token_for_path = ""
 
+    token_snapshot = token_snapshot or {}
+    input_cached = token_snapshot.get(input_token_symbol) or {}
     if is_input_native:
         amount_in_wei = Web3.to_wei(amount_in, 'ether')
         input_token_for_path = Web3.to_checksum_address(weth_address_str)
     else:
         input_address = Web3.to_checksum_address(input_token_address_str)
-        input_contract = web3_instance.eth.contract(address=input_address, abi=MINIMAL_ERC20_ABI)
+        input_contract = _get_contract(web3_instance, input_address, "erc20")
         try:
-            input_decimals = input_contract.functions.decimals().call()
+            input_decimals = input_cached.get("decimals")
+            if input_decimals is None: input_decimals = input_contract.functions.decimals().call()
             amount_in_wei = int(float(amount_in) * (10**input_decimals))
         except Exception as e:
             return tx_hash_str, False, f"Could not get decimals for input token {input_token_symbol}: {e}"
         input_token_for_path = input_address
 
     if amount_in_wei <= 0: return tx_hash_str, False, "Input amount must be positive."
+    if input_cached.get("balance") is not None and input_cached["balance"] < amount_in_wei:
+        return tx_hash_str, False, f"Insufficient {input_token_symbol} balance for trade (have {input_cached['balance'] / (10**input_decimals)}, need {amount_in})."
 
     output_token_for_path = ""
     if is_output_native:
@@ -446,11 +659,24 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
 
 
     print(f"Trade path: {input_token_symbol} -> {output_token_symbol} via [{' -> '.join(path)}]")
-    dex_contract = web3_instance.eth.contract(address=dex_router_address, abi=UNISWAP_V2_ROUTER_ABI)
+    dex_contract = _get_contract(web3_instance, dex_router_address, "uniswap_v2_router")
+
+    # --- Pre-trade reads: quote, gas price and (without a nonce source) nonce in one JSON-RPC batch where the endpoint allows ---
+    gas_price, swap_nonce, amounts_out_list = None, None, None
+    try:
+        quote_call = {"to": dex_router_address, "data": dex_contract.functions.getAmountsOut(amount_in_wei, path)._encode_transaction_data()}
+        pre_reads = [("eth_call", [quote_call, "latest"]), ("eth_gasPrice", [])]
+        if nonce is None: pre_reads.append(("eth_getTransactionCount", [wallet_account.address, "pending"]))
+        batch_results = _rpc_batch(web3_instance, pre_reads)
+        amounts_out_list = web3_instance.codec.decode(['uint256[]'], bytes.fromhex(batch_results[0][2:]))[0]
+        gas_price = int(batch_results[1], 16)
+        if nonce is None: swap_nonce = int(batch_results[2], 16)
+    except Exception as e:
+        print(f"Info: Batched pre-trade reads unavailable ({type(e).__name__}); using individual RPC calls.")
 
     # --- Estimate Output & Deadline ---
     try:
-        amounts_out_list = dex_contract.functions.getAmountsOut(amount_in_wei, path).call()
+        if amounts_out_list is None: amounts_out_list = dex_contract.functions.getAmountsOut(amount_in_wei, path).call()
         estimated_out_wei = amounts_out_list[-1]
         min_out_wei = int(estimated_out_wei * (1 - slippage_tolerance))
         if min_out_wei <= 0:
@@ -461,23 +687,29 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
     deadline = int(time.time()) + (20 * 60) # 20 minutes
 
     # --- Approve ERC20 Input Token (if not native) ---
+    # Sent and awaited inline even when wait_for_receipt is False: the swap below takes the next nonce from the same source.
     if not is_input_native:
         print(f"ERC20 input: Ensuring {input_token_symbol} is approved for DEX router {dex_router_address}...")
         approve_ok, approve_msg_or_hash = approve_token(
             web3_instance, wallet_account, input_token_symbol, dex_router_address,
-            network_name, amount_in, config_path
+            network_name, amount_in, config_path, token_snapshot, config=config, nonce=nonce
         )
         if not approve_ok:
             return approve_msg_or_hash, False, f"Approval for {input_token_symbol} failed: {approve_msg_or_hash}"
+        if str(approve_msg_or_hash).startswith("0x"): # An approval tx was sent, so the batched or given nonce is used up
+            swap_nonce = None
+            if isinstance(nonce, int): nonce += 1
         print(f"Approval for {input_token_symbol} confirmed or already sufficient. Details: {approve_msg_or_hash}")
 
     # --- Prepare and Log Trade Details ---
     output_decimals = 18 # Default
     try:
         if not is_output_native:
-            out_contract = web3_instance.eth.contract(address=output_token_for_path, abi=MINIMAL_ERC20_ABI)
-            output_decimals = out_contract.functions.decimals().call()
-    except Exception: pass # Use default if decimals fetch fails
+            output_decimals = (token_snapshot.get(output_token_symbol) or {}).get("decimals")
+            if output_decimals is None:
+                out_contract = _get_contract(web3_instance, output_token_for_path, "erc20")
+                output_decimals = out_contract.functions.decimals().call()
+    except Exception: output_decimals = 18 # Use default if decimals fetch fails
 
     print("\n" + "="*80)
     print(f"         PENDING ON-CHAIN TRADE ON {network_name.upper()} VIA {dex_name.upper()}")
@@ -492,8 +724,9 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
     # Consider adding a brief `time.sleep(3)` here if user needs to see this before logs continue rapidly.
 
     # --- Build and Send Transaction ---
-    tx_params = {'from': wallet_account.address, 'gasPrice': web3_instance.eth.gas_price,
-                 'nonce': web3_instance.eth.get_transaction_count(wallet_account.address), 'chainId': chain_id}
+    if gas_price is None: gas_price = web3_instance.eth.gas_price
+    if swap_nonce is None: swap_nonce = _take_nonce(web3_instance, wallet_account.address, nonce)
+    tx_params = {'from': wallet_account.address, 'gasPrice': gas_price, 'nonce': swap_nonce, 'chainId': chain_id}
 
     if is_input_native:
         swap_function_call = dex_contract.functions.swapExactETHForTokens(min_out_wei, path, wallet_account.address, deadline)
@@ -511,25 +744,21 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
         except Exception as gas_est_ex:
             err_msg = f"Gas estimation failed: {type(gas_est_ex).__name__} - {gas_est_ex}."
             print(f"CRITICAL: {err_msg} This often indicates a pre-send revert condition (e.g., liquidity, bad path).")
+            _release_nonce(nonce, swap_nonce)
             return tx_hash_str, False, err_msg
 
         signed_tx = web3_instance.eth.account.sign_transaction(unsigned_tx, wallet_account.key)
         tx_bytes = web3_instance.eth.send_raw_transaction(signed_tx.rawTransaction)
         tx_hash_str = Web3.to_hex(tx_bytes)
         print(f"Swap transaction sent. Hash: {tx_hash_str}")
+        if input_cached.get("balance") is not None: input_cached["balance"] -= amount_in_wei # Keep snapshot valid for later trades
+        allowance_left = input_cached.get("allowances", {}).get(dex_router_address)
+        if allowance_left is not None and allowance_left < 2**256 - 1: input_cached["allowances"][dex_router_address] = max(0, allowance_left - amount_in_wei)
 
-        print(f"Waiting for swap transaction receipt (Tx: {tx_hash_str}, timeout ~5 mins)...")
-        tx_receipt = web3_instance.eth.wait_for_transaction_receipt(tx_bytes, timeout=300) # Use tx_bytes here
-
-        if tx_receipt.status == 1:
-            msg = f"Swap successful. Tx: {tx_hash_str}"
-            print(msg)
-            # Actual amount out can be parsed from logs here if needed for more precision.
-            return tx_hash_str, True, msg
-        else:
-            msg = f"Swap transaction failed on-chain. Status: {tx_receipt.get('status')}. Tx: {tx_hash_str}. Receipt: {tx_receipt}"
-            print(msg)
-            return tx_hash_str, False, msg
+        if not wait_for_receipt:
+            return tx_hash_str, True, f"Swap submitted. Tx: {tx_hash_str}"
+        success, msg = wait_for_trade_receipt(web3_instance, tx_hash_str)
+        return tx_hash_str, success, msg
 
     except Exception as e:
         err_type = type(e).__name__
@@ -542,9 +771,65 @@ def execute_trade(web3_instance, wallet_account, network_name, dex_name,
         elif "gas" in err_detail: specific_msg = "Gas issue (e.g., intrinsic gas too low, out of gas)."
         else: specific_msg = f"Trade execution error: {err_type} - {e}"
 
+        if tx_hash_str is None: _release_nonce(nonce, swap_nonce)
         print(f"Error: {specific_msg}")
         return tx_hash_str, False, specific_msg # tx_hash_str may or may not be set here
 
+def wait_for_trade_receipt(web3_instance, tx_hash, timeout=300):
+    """
+    Waits for a swap broadcast by `execute_trade` to be mined.
+
+    Args:
+        web3_instance (Web3): Active Web3 instance.
+        tx_hash (str): Hash of the swap transaction.
+        timeout (int): Seconds to wait for the receipt.
+
+    Returns:
+        tuple (bool, str): (success_status, message)
+    """
+    try:
+        print(f"Waiting for swap transaction receipt (Tx: {tx_hash}, timeout ~{timeout // 60} mins)...")
+        tx_receipt = web3_instance.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+    except Exception as e:
+        msg = f"Error waiting for swap receipt (Tx: {tx_hash}): {type(e).__name__} - {e}"
+        print(msg)
+        return False, msg
+
+    return _receipt_outcome(tx_receipt, tx_hash)
+
+def _receipt_outcome(tx_receipt, tx_hash):
+    status = tx_receipt.get('status')
+    if isinstance(status, str): status = int(status, 16) # Raw JSON-RPC receipts carry hex quantities
+    if status == 1:
+        msg = f"Swap successful. Tx: {tx_hash}"
+        print(msg)
+        # Actual amount out can be parsed from logs here if needed for more precision.
+        return True, msg
+    msg = f"Swap transaction failed on-chain. Status: {status}. Tx: {tx_hash}. Receipt: {tx_receipt}"
+    print(msg)
+    return False, msg
+
+def get_trade_receipts(web3_instance, tx_hashes):
+    """
+    Checks once, without waiting, whether swaps broadcast by `execute_trade` have been mined.
+    Uses one JSON-RPC batch where the endpoint allows, so callers can poll many swaps cheaply.
+
+    Args:
+        web3_instance (Web3): Active Web3 instance.
+        tx_hashes (list of str): Hashes of the swap transactions.
+
+    Returns:
+        list of (tuple (bool, str) or None): (success_status, message) per hash, None while still pending.
+    """
+    try:
+        receipts = _rpc_batch(web3_instance, [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes])
+    except Exception:
+        receipts = []
+        for tx_hash in tx_hashes:
+            try: receipts.append(web3_instance.eth.get_transaction_receipt(tx_hash))
+            except TransactionNotFound: receipts.append(None)
+    return [_receipt_outcome(receipt, tx_hash) if receipt else None for tx_hash, receipt in zip(tx_hashes, receipts)]
+
 if __name__ == '__main__':
     print("\n" + "="*70)
     print(" evm_utils.py - Example Usage & Manual Testing Section")
@@ -419,4 +419,3 @@ async def run_all_solana_tests_main():
 if __name__ == '__main__':
     asyncio.run(run_all_solana_tests_main())
     print("\nAll Solana utility tests in solana_utils.py finished.")
-```
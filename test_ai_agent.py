@@ -0,0 +1,197 @@
+"""
+test_ai_agent.py: Offline unit tests for the caching, voting, journal and synopsis logic in `ai_agent.py`.
+
+No API keys, RPC endpoints or network access are used: agents and model calls are replaced
+with small fakes. The modules `ai_agent.py` imports must still be installed.
+
+Run with: `python -m unittest test_ai_agent`
+"""
+import asyncio
+import functools
+import json
+import os
+import re
+import tempfile
+import types
+import unittest
+from collections import deque
+from unittest import mock
+
+from ai_agent import AgentGroup, AnalysisCache, MultisigWallet, PromptCache
+
+
+class FakeAgent:
+    """Stands in for AIAgent in MultisigWallet: votes `verdict` after `delay` seconds and records cancellation."""
+    def __init__(self, name, verdict="APPROVE", delay=0.0):
+        self.name, self.verdict, self.delay = name, verdict, delay
+        self.calls, self.cancelled = 0, False
+
+    async def vote_on_transaction_async(self, tx, ctx_json):
+        self.calls += 1
+        try: await asyncio.sleep(self.delay)
+        except asyncio.CancelledError: self.cancelled = True; raise
+        return f"{self.verdict} - fake vote"
+
+
+class PromptCacheTest(unittest.TestCase):
+    def test_entry_expires_after_ttl(self):
+        cache = PromptCache(maxsize=4, ttl=10)
+        with mock.patch("ai_agent.time.monotonic", return_value=100.0): cache.put("prompt", "response")
+        with mock.patch("ai_agent.time.monotonic", return_value=110.0): self.assertEqual(cache.get("prompt"), "response")
+        with mock.patch("ai_agent.time.monotonic", return_value=110.5): self.assertIsNone(cache.get("prompt"))
+        self.assertEqual(len(cache._entries), 0) # Expired entry is dropped on lookup
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = PromptCache(maxsize=2, ttl=300)
+        cache.put("a", "1"); cache.put("b", "2")
+        self.assertEqual(cache.get("a"), "1") # "a" is now the most recently used
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("1", "3"))
+
+    def test_put_refreshes_existing_entry(self):
+        cache = PromptCache(maxsize=2, ttl=300)
+        cache.put("a", "1"); cache.put("b", "2"); cache.put("a", "1b"); cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1b")
+
+
+class CollectVotesTest(unittest.TestCase):
+    def test_remaining_voters_cancelled_once_threshold_reached(self):
+        fast = [FakeAgent("fast1"), FakeAgent("fast2")]
+        slow = [FakeAgent("slow1", delay=30), FakeAgent("slow2", delay=30)]
+        wallet = MultisigWallet(fast + slow, 2)
+        wallet.propose_transaction({"action": "TRADE", "input_token": "ETH"})
+        tx_w = wallet.pending_transactions[0]
+
+        async def run():
+            await asyncio.wait_for(wallet._collect_votes(tx_w, "{}"), timeout=5) # Must not wait for the slow voters
+            await asyncio.sleep(0) # Let the cancellations be delivered
+        asyncio.run(run())
+
+        self.assertEqual(tx_w["tally"], {"APPROVE": 2, "REJECT": 0})
+        self.assertEqual(tx_w["_voted"], {"fast1", "fast2"})
+        self.assertTrue(all(a.cancelled for a in slow))
+
+    def test_rejection_majority_also_stops_voting(self):
+        agents = [FakeAgent("r1", "REJECT"), FakeAgent("r2", "REJECT"), FakeAgent("slow", delay=30)]
+        wallet = MultisigWallet(agents, 2)
+        wallet.propose_transaction({"action": "TRADE", "input_token": "ETH"})
+        asyncio.run(asyncio.wait_for(wallet.vote_on_transactions("{}"), timeout=5))
+        self.assertEqual(wallet.pending_transactions[0]["status"], "rejected")
+        self.assertTrue(agents[2].cancelled)
+
+
+class SimulatedFastPathTest(unittest.TestCase):
+    def test_simulated_tx_is_approved_without_agent_votes(self):
+        agent = FakeAgent("a1")
+        wallet = MultisigWallet([agent], 1, fast_path_simulated=True)
+        wallet.propose_transaction({"action": "BUY", "crypto": "ETH", "simulated": True})
+        wallet.propose_transaction({"action": "TRADE", "input_token": "ETH"})
+        simulated, onchain = wallet.pending_transactions
+        self.assertEqual(simulated["status"], "approved")
+        self.assertEqual([v["agent"] for v in simulated["votes"]], ["policy_engine"])
+        self.assertEqual(onchain["status"], "pending")
+        asyncio.run(wallet.vote_on_transactions("{}"))
+        self.assertEqual(agent.calls, 1) # Only the on-chain tx was put to a vote
+        self.assertEqual([tx_w["id"] for tx_w in wallet.get_approved_transactions()], [simulated["id"], onchain["id"]])
+
+    def test_fast_path_is_opt_in(self):
+        wallet = MultisigWallet([FakeAgent("a1")], 1)
+        wallet.propose_transaction({"action": "BUY", "crypto": "ETH", "simulated": True})
+        self.assertEqual(wallet.pending_transactions[0]["status"], "pending")
+
+
+class JournalReplayTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.group = types.SimpleNamespace(discussion_journal_file=self.path) # _iter_journal only needs the path
+
+    def _write(self, text):
+        with open(self.path, "w", encoding="utf-8") as f: f.write(text)
+
+    def _replay(self, tail=None):
+        return [entry["n"] for entry in AgentGroup._iter_journal(self.group, tail)]
+
+    def test_tail_skips_truncated_last_line(self):
+        self._write("".join(json.dumps({"n": n}) + "\n" for n in range(1, 4)) + '{"n": 4, "resp') # Torn final write
+        self.assertEqual(self._replay(), [1, 2, 3])
+        self.assertEqual(self._replay(tail=2), [3]) # The torn line counts towards the tail and is skipped
+        self.assertEqual(self._replay(tail=3), [2, 3])
+
+    def test_tail_with_trailing_newline_and_oversized_tail(self):
+        self._write("".join(json.dumps({"n": n}) + "\n" for n in range(1, 6)))
+        self.assertEqual(self._replay(tail=2), [4, 5])
+        self.assertEqual(self._replay(tail=50), [1, 2, 3, 4, 5])
+
+
+class SynopsisArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.wallet = MultisigWallet([], 1, archive_max=3)
+        self.model = mock.AsyncMock(return_value="summary")
+        self.group = types.SimpleNamespace(
+            discussion_log=deque(), evm_config={}, multisig_wallet=self.wallet, _synopsis_archive_mark=0, current_day=1,
+            agents=[types.SimpleNamespace(_generate_async=self.model)], synopsis="",
+            log_message=mock.AsyncMock(), broadcast=mock.AsyncMock(), _synopsis_tx_line=AgentGroup._synopsis_tx_line)
+
+    def _finalize(self, count):
+        ids = []
+        for _ in range(count):
+            self.wallet.propose_transaction({"action": "TRADE", "input_token": "ETH"})
+            ids.append(self.wallet.pending_transactions[-1]["id"])
+            self.wallet.mark_transaction_processed(ids[-1], "failed_onchain_evm_execution")
+        return ids
+
+    def _reported_ids(self):
+        asyncio.run(AgentGroup.generate_synopsis(self.group))
+        if not self.model.await_count: return []
+        prompt = self.model.await_args[0][0]; self.model.reset_mock()
+        return re.findall(r"TxID (\S+):", prompt)
+
+    def test_reports_only_new_txs_still_in_overflowed_archive(self):
+        first = self._finalize(2)
+        self.assertEqual(self._reported_ids(), first)
+        second = self._finalize(5) # Overflows archive_max=3: the first two of these are already dropped
+        self.assertEqual(self._reported_ids(), second[-3:])
+        third = self._finalize(1)
+        self.assertEqual(self._reported_ids(), third)
+        self.assertEqual(self._reported_ids(), []) # Nothing new: no model call
+
+class ConcurrentAnalysisTest(unittest.TestCase):
+    def test_eviction_while_fetching_does_not_break_other_analyses(self):
+        group = types.SimpleNamespace(
+            context={"token_analysis_reports": {}, "available_token_analyses_summary": {}}, max_analyses_in_context=1,
+            CHAIN_NAME_TO_ID_MAP={"ethereum": {"goplus": "1", "dexscreener": None}}, analysis_cache=AnalysisCache(),
+            log_message=mock.AsyncMock())
+        group._touch_analysis = functools.partial(AgentGroup._touch_analysis, group)
+
+        async def fake_report(token_addr, chain_id):
+            await asyncio.sleep(0.02 if token_addr == "0xA" else 0) # 0xB finishes (and evicts) while 0xA is still fetching
+            return {"is_honeypot": False, "warnings": [], "retrieved_at": 0}
+
+        async def run():
+            return await asyncio.gather(*(AgentGroup._analyze_one(group, t, "ethereum") for t in ("0xA", "0xB")), return_exceptions=True)
+        with mock.patch("ai_agent.fetch_token_security_report", fake_report):
+            self.assertEqual(asyncio.run(run()), [None, None])
+        self.assertEqual(list(group.context["token_analysis_reports"]), ["0xA"]) # Cap of 1 kept; last finished wins
+        self.assertIn("security_summary", group.context["available_token_analyses_summary"]["0xA"])
+
+
+class PriceSnapshotTest(unittest.TestCase):
+    def test_context_only_dirtied_when_prices_moved(self):
+        group = types.SimpleNamespace(context={}, _live_prices={}, _touch_context=mock.Mock())
+        AgentGroup._snapshot_prices(group)
+        group._live_prices["ETH"] = {"usd": 3000.0, "publish_time": 1}
+        AgentGroup._snapshot_prices(group); AgentGroup._snapshot_prices(group)
+        self.assertEqual(group.context["prices"], {"ETH": {"usd": 3000.0, "publish_time": 1}})
+        self.assertEqual(group._touch_context.call_count, 1)
+        group._live_prices["ETH"] = {"usd": 3001.0, "publish_time": 2}
+        AgentGroup._snapshot_prices(group)
+        self.assertEqual(group.context["prices"]["ETH"]["usd"], 3001.0)
+        self.assertEqual(group._touch_context.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,6 +59,8 @@ This script is for development and testing convenience.
 import json
 import time
 import os # For environment variable access
+import unittest
+from unittest import mock
 from web3 import Web3
 
 # Assuming evm_utils.py is in the same directory or Python path
@@ -69,6 +71,7 @@ from evm_utils import (
     get_token_balance,
     approve_token,
     execute_trade,
+    get_erc20_snapshot,
     MINIMAL_ERC20_ABI # Used for some internal test logic if needed
 )
 
@@ -326,6 +329,49 @@ def test_execute_trade_interactive(w3, wallet, network_name, config, config_path
     print("--- Test Execute Trade Complete ---")
 
 
+# --- Offline Unit Tests (no RPC; run with `python -m unittest test_evm_utils`) ---
+
+class GetErc20SnapshotTest(unittest.TestCase):
+    """Decoding of a mocked Multicall3 `aggregate3` response by `get_erc20_snapshot`."""
+    WALLET = "0x" + "11" * 20
+    ROUTER = Web3.to_checksum_address("0x" + "22" * 20)
+    USDC = Web3.to_checksum_address("0x" + "33" * 20)
+    CONFIG = {"token_addresses": {"testnet": {"NATIVE": "ETH", "USDC": "0x" + "33" * 20}}}
+
+    @staticmethod
+    def _word(value): return value.to_bytes(32, 'big') # ABI-encoded uint256
+
+    def _snapshot(self, aggregate3_results):
+        web3_instance = mock.MagicMock()
+        web3_instance.codec = Web3().codec
+        web3_instance.eth.get_balance.return_value = 7
+        multicall = mock.MagicMock()
+        multicall.functions.aggregate3.return_value.call.return_value = aggregate3_results
+        contracts = {"multicall3": multicall, "erc20": mock.MagicMock()}
+        with mock.patch("evm_utils._get_contract", side_effect=lambda w3, address, abi_name: contracts[abi_name]):
+            snapshot = get_erc20_snapshot(web3_instance, self.WALLET, "testnet", ["ETH", "USDC"],
+                                          spender_addresses=[self.ROUTER], config=self.CONFIG)
+        return snapshot, web3_instance, multicall
+
+    def test_decodes_results_in_read_order(self):
+        # Reads: ETH getEthBalance, USDC decimals, USDC balanceOf, USDC allowance(router)
+        snapshot, web3_instance, multicall = self._snapshot([
+            (True, self._word(5 * 10**18)), (True, self._word(6)), (True, self._word(1234)), (True, self._word(2**256 - 1))])
+        self.assertEqual(len(multicall.functions.aggregate3.call_args[0][0]), 4)
+        self.assertEqual(snapshot["ETH"], {"address": None, "decimals": 18, "balance": 5 * 10**18, "allowances": {}})
+        self.assertEqual(snapshot["USDC"], {"address": self.USDC, "decimals": 6, "balance": 1234,
+                                            "allowances": {self.ROUTER: 2**256 - 1}})
+        web3_instance.eth.get_balance.assert_not_called()
+
+    def test_failed_calls_stay_none_and_native_balance_falls_back(self):
+        snapshot, web3_instance, _ = self._snapshot([
+            (False, b""), (True, self._word(18)), (True, b""), (False, b"")])
+        self.assertEqual(snapshot["ETH"]["balance"], 7) # Read directly after getEthBalance failed
+        self.assertEqual(snapshot["USDC"]["decimals"], 18)
+        self.assertIsNone(snapshot["USDC"]["balance"])
+        self.assertIsNone(snapshot["USDC"]["allowances"][self.ROUTER])
+
+
 if __name__ == "__main__":
     print("="*70)
     print("EVM UTILITIES INTERACTIVE TEST SUITE")
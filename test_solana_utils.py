@@ -178,4 +178,3 @@ async def main_solana_tests():
 
 if __name__ == "__main__":
     asyncio.run(main_solana_tests())
-```
@@ -202,4 +202,3 @@ async def run_all_analyzer_tests():
 
 if __name__ == "__main__":
     asyncio.run(run_all_analyzer_tests())
-```
@@ -396,4 +396,3 @@ if __name__ == '__main__':
         print("\nToken analyzer example usage complete. Uncomment specific tests and ensure API keys are set for full functionality.")
 
     asyncio.run(run_tests())
-```